@@ -0,0 +1,78 @@
+"""
+Process-wide candle cache shared by all strategies.
+Re-fetches only the candles that changed since the previous call.
+"""
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple
+
+# Candle interval lengths in milliseconds (read-only)
+TIMEFRAME_MS: Mapping[str, int] = MappingProxyType({
+    "1h": 3600000,
+    "4h": 14400000,
+    "1d": 86400000,
+    "15m": 900000,
+    "30m": 1800000,
+})
+
+# (symbol, timeframe) -> (bucket id of last fetch, candles oldest to newest)
+_cache: Dict[Tuple[str, str], Tuple[int, List[Dict[str, Any]]]] = {}
+_lock = threading.Lock()
+
+
+def fetch_candles(info, symbol: str, timeframe: str, lookback_candles: int) -> List[Dict[str, Any]]:
+    """
+    Fetch the most recent candles for a symbol, reusing cached history.
+    
+    Within the same timeframe bucket the cached list is returned as-is. Once a
+    new bucket starts, only candles from the last cached candle onward are
+    requested (the last one is re-fetched because it may still have been
+    forming) and merged into the cached window.
+    
+    Args:
+        info: Hyperliquid Info client
+        symbol: Trading symbol (e.g., "BTC")
+        timeframe: Candle interval (e.g., "15m", "1h")
+        lookback_candles: Number of candles the window should cover
+    
+    Returns:
+        List of candle dictionaries (oldest to newest). The list is shared
+        with the cache and must not be modified. Non-list API responses are
+        returned unchanged and not cached.
+    """
+    timeframe_ms = TIMEFRAME_MS.get(timeframe, 3600000)
+    end_time = int(time.time() * 1000)
+    start_time = end_time - (lookback_candles * timeframe_ms)
+    bucket = end_time // timeframe_ms
+    key = (symbol, timeframe)
+    
+    with _lock:
+        cached = _cache.get(key)
+    
+    if cached and cached[0] == bucket:
+        return cached[1]
+    
+    # Only fetch the delta if the cached window still overlaps the requested one
+    cached_candles = cached[1] if cached else []
+    if cached_candles and cached_candles[-1]["t"] >= start_time:
+        fetch_start = cached_candles[-1]["t"]
+    else:
+        cached_candles = []
+        fetch_start = start_time
+    
+    fresh = info.candles_snapshot(symbol, timeframe, fetch_start, end_time)
+    if not isinstance(fresh, list):
+        return fresh
+    if not fresh:
+        # Keep serving the old window, but retry on the next call
+        return cached_candles
+    
+    first_fresh_t = fresh[0]["t"]
+    merged = [c for c in cached_candles if c["t"] < first_fresh_t] + fresh
+    candles = [c for c in merged if c["t"] >= start_time]
+    
+    with _lock:
+        _cache[key] = (bucket, candles)
+    
+    return candles
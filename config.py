@@ -7,6 +7,12 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _getenv(name: str, default: str) -> str:
+    """Read an environment variable, stripping quotes some hosts keep around the value."""
+    return os.getenv(name, default).strip('"\'')
+
+
 # Hyperliquid API Configuration
 API_URL = os.getenv("API_URL", "https://api.hyperliquid.xyz")  # Use testnet: https://api.hyperliquid-testnet.xyz
 PRIVATE_KEY = os.getenv("PRIVATE_KEY", "")  # Your Ethereum-style private key (hex format, 0x prefix optional)
@@ -14,3 +20,23 @@ PRIVATE_KEY = os.getenv("PRIVATE_KEY", "")  # Your Ethereum-style private key (h
 # Trading Configuration
 USE_TESTNET = os.getenv("USE_TESTNET", "false").lower() == "true"
 
+# Stream mid prices and account state over a WebSocket instead of requesting them per trade
+USE_WEBSOCKET = os.getenv("USE_WEBSOCKET", "false").lower() == "true"
+
+# Simulate orders and leverage updates instead of sending them (market data is still live)
+DRY_RUN = os.getenv("DRY_RUN", "false").lower() == "true"
+
+# Strategy Configuration (parsed once, at import)
+SYMBOLS = [s.strip() for s in _getenv("SYMBOLS", "ETH,SOL,BTC").split(",")]
+COLLATERAL_USD = float(_getenv("COLLATERAL_USD", "25.0"))
+STOP_LOSS_PERCENT = float(_getenv("STOP_LOSS_PERCENT", "30.0"))
+TAKE_PROFIT_PERCENT = float(_getenv("TAKE_PROFIT_PERCENT", "100.0"))
+TIMEFRAME = _getenv("TIMEFRAME", "15m")
+
+# Runtime Configuration
+HEALTH_CHECK_PORT = int(_getenv("HEALTH_CHECK_PORT", os.getenv("PORT", "8080")))
+LOG_LEVEL = _getenv("LOG_LEVEL", "INFO").upper()
+EMA_STATE_FILE = _getenv("EMA_STATE_FILE", "ema_state.json")
+# Maximum random delay (seconds) before the first API requests, so bots
+# restarted together on one IP don't hit the rate limit at the same instant
+BOOT_STAGGER_SECONDS = float(_getenv("BOOT_STAGGER_SECONDS", "0"))
@@ -1,11 +1,26 @@
 """
 EMA 9/20 Crossover Strategy for multiple assets (ETH, SOL, BTC, XRP).
 """
-from typing import Dict, Any, Optional, List
+import json
+import logging
+import os
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from operator import itemgetter
+from typing import Deque, Dict, Any, Optional, List
 from trading_bot import TradingBot
 from strategy_template import AdvancedStrategy
-from technical_indicators import calculate_ema, detect_crossover, get_current_ema_values, get_ema_trend
+from candle_cache import TIMEFRAME_MS, fetch_candles
+from technical_indicators import StreamingEMA, detect_crossover, detect_crossover_at, get_current_ema_values, get_ema_trend
+
+log = logging.getLogger(__name__)
+
+# Banner line around report sections
+SEPARATOR = "=" * 60
+
+# Close price accessor for candle dictionaries
+_candle_close = itemgetter('c')
 
 
 class EMA9_20Strategy(AdvancedStrategy):
@@ -17,6 +32,24 @@ class EMA9_20Strategy(AdvancedStrategy):
     - SELL: EMA 9 crosses below EMA 20 (bearish crossover)
     """
     
+    __slots__ = (
+        "timeframe",
+        "lookback_candles",
+        "_timeframe_ms",
+        "require_confirmation",
+        "ema9",
+        "ema20",
+        "current_signal",
+        "prices",
+        "_ema9_state",
+        "_ema20_state",
+        "_last_closed_t",
+        "_closed_prices",
+        "_closed_ema9",
+        "_closed_ema20",
+        "_computed_at",
+    )
+    
     def __init__(
         self,
         bot: TradingBot,
@@ -57,72 +90,161 @@ class EMA9_20Strategy(AdvancedStrategy):
         
         self.timeframe = timeframe
         self.lookback_candles = lookback_candles
+        self._timeframe_ms = TIMEFRAME_MS.get(timeframe, 3600000)
         self.require_confirmation = require_confirmation
         
-        # Store EMA data
+        # Store EMA data (last 3 values: two closed candles plus the forming one)
         self.ema9: Optional[List[float]] = None
         self.ema20: Optional[List[float]] = None
         self.current_signal: Optional[str] = None
         self.prices: Optional[List[float]] = None
+        
+        # Incremental EMA state, advanced only by closed candles
+        self._ema9_state = StreamingEMA(9)
+        self._ema20_state = StreamingEMA(20)
+        self._last_closed_t: Optional[int] = None
+        # Only the last two closed values are ever read
+        self._closed_prices: Deque[float] = deque(maxlen=2)
+        self._closed_ema9: Deque[Optional[float]] = deque(maxlen=2)
+        self._closed_ema20: Deque[Optional[float]] = deque(maxlen=2)
+        
+        # Timeframe bucket of the last successful calculate_emas call
+        self._computed_at: Optional[int] = None
+    
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Export incremental EMA state so it can survive a restart.
+        
+        Returns:
+            JSON-serializable dictionary that restore_state() accepts
+        """
+        return {
+            "timeframe": self.timeframe,
+            "last_closed_t": self._last_closed_t,
+            "ema9": self._ema9_state.to_state(),
+            "ema20": self._ema20_state.to_state(),
+            "closed_prices": list(self._closed_prices),
+            "closed_ema9": list(self._closed_ema9),
+            "closed_ema20": list(self._closed_ema20),
+        }
+    
+    def restore_state(self, state: Dict[str, Any]):
+        """
+        Restore incremental EMA state exported by to_state().
+        
+        If the saved state is too old to overlap the next candle window,
+        calculate_emas rebuilds it from scratch as usual.
+        
+        Args:
+            state: Dictionary from to_state()
+        """
+        if state["timeframe"] != self.timeframe:
+            raise ValueError(f"Timeframe mismatch: expected {self.timeframe}, got {state['timeframe']}")
+        
+        # Clearing the last candle time first means a partial restore falls
+        # back to a cold start on the next calculate_emas call
+        self._last_closed_t = None
+        self._ema9_state.restore_state(state["ema9"])
+        self._ema20_state.restore_state(state["ema20"])
+        self._closed_prices.clear()
+        self._closed_prices.extend(state["closed_prices"])
+        self._closed_ema9.clear()
+        self._closed_ema9.extend(state["closed_ema9"])
+        self._closed_ema20.clear()
+        self._closed_ema20.extend(state["closed_ema20"])
+        self._last_closed_t = state["last_closed_t"]
+    
+    def _current_bucket(self) -> int:
+        """
+        Get the id of the current timeframe bucket.
+        
+        Returns:
+            Current time in ms divided by the timeframe length
+        """
+        return int(time.time() * 1000) // self._timeframe_ms
     
     def get_candles(self) -> List[Dict[str, Any]]:
         """
         Fetch historical candles from Hyperliquid.
         
+        Candles are served from the shared candle cache, so repeated calls only
+        hit the API for candles that changed since the last fetch.
+        
         Returns:
             List of candle dictionaries
         """
         try:
-            end_time = int(time.time() * 1000)  # Current time in milliseconds
-            # Calculate start time based on lookback_candles
-            # Approximate: 1h = 3600000 ms, 4h = 14400000 ms, 1d = 86400000 ms
-            timeframe_ms = {
-                "1h": 3600000,
-                "4h": 14400000,
-                "1d": 86400000,
-                "15m": 900000,
-                "30m": 1800000,
-            }.get(self.timeframe, 3600000)
-            
-            start_time = end_time - (self.lookback_candles * timeframe_ms)
-            
-            candles = self.bot.info.candles_snapshot(
+            candles = fetch_candles(
+                self.bot.info,
                 self.symbol,
                 self.timeframe,
-                start_time,
-                end_time
+                self.lookback_candles
             )
             
             if isinstance(candles, list):
                 return candles
             else:
-                print(f"⚠️  Unexpected candle format for {self.symbol}")
+                log.warning("⚠️  Unexpected candle format for %s", self.symbol)
                 return []
         except Exception as e:
-            print(f"❌ Error fetching candles for {self.symbol}: {e}")
+            log.error("❌ Error fetching candles for %s: %s", self.symbol, e)
             return []
     
     def calculate_emas(self) -> bool:
         """
         Calculate EMA 9 and EMA 20 from candle data.
         
+        Also stores the crossover signal for the latest candle in current_signal.
+        
         Returns:
             True if EMAs calculated successfully, False otherwise
         """
+        bucket = self._current_bucket()
+        self.current_signal = None
         candles = self.get_candles()
         
         if len(candles) < 50:  # Need at least 50 candles for EMA 20
-            print(f"⚠️  Insufficient candles for {self.symbol}: {len(candles)}")
+            log.warning("⚠️  Insufficient candles for %s: %d", self.symbol, len(candles))
             return False
         
-        # Extract close prices (sorted by time, oldest first)
-        # Candles should already be sorted, but ensure they are
-        sorted_candles = sorted(candles, key=lambda x: x.get('t', 0))
-        self.prices = [float(candle['c']) for candle in sorted_candles]
-        
-        # Calculate EMAs
-        self.ema9 = calculate_ema(self.prices, 9)
-        self.ema20 = calculate_ema(self.prices, 20)
+        # Candles arrive oldest first; only flip them if they come back reversed.
+        # The cached list is shared, so never reorder it in place.
+        if candles[0]['t'] > candles[-1]['t']:
+            candles = candles[::-1]
+        # Every candle but the last has closed; index into the list rather
+        # than slicing off the closed ones, which would copy the whole window
+        closed_count = len(candles) - 1
+        live_candle = candles[-1]
+        
+        # Start over on the first run, or if the window no longer overlaps the
+        # last candle we processed (candles may have been missed)
+        if self._last_closed_t is None or candles[0]['t'] > self._last_closed_t:
+            self._ema9_state.reset()
+            self._ema20_state.reset()
+            self._last_closed_t = None
+            self._closed_prices.clear()
+            self._closed_ema9.clear()
+            self._closed_ema20.clear()
+            start = 0
+        else:
+            # Only candles closed since the last update need processing
+            start = closed_count
+            while start > 0 and candles[start - 1]['t'] > self._last_closed_t:
+                start -= 1
+        
+        for i in range(start, closed_count):
+            close = float(_candle_close(candles[i]))
+            self._closed_prices.append(close)
+            self._closed_ema9.append(self._ema9_state.update(close))
+            self._closed_ema20.append(self._ema20_state.update(close))
+        if start < closed_count:
+            self._last_closed_t = candles[closed_count - 1]['t']
+        
+        # The forming candle is evaluated without advancing the EMA state
+        live_price = float(_candle_close(live_candle))
+        self.prices = [*self._closed_prices, live_price]
+        self.ema9 = [*self._closed_ema9, self._ema9_state.peek(live_price)]
+        self.ema20 = [*self._closed_ema20, self._ema20_state.peek(live_price)]
         
         # Verify we have valid EMA values
         if not self.ema9 or not self.ema20:
@@ -131,6 +253,8 @@ class EMA9_20Strategy(AdvancedStrategy):
         if self.ema9[-1] is None or self.ema20[-1] is None:
             return False
         
+        self.current_signal = detect_crossover(self.ema9, self.ema20)
+        self._computed_at = bucket
         return True
     
     def should_execute(self) -> bool:
@@ -140,19 +264,16 @@ class EMA9_20Strategy(AdvancedStrategy):
         Returns:
             True if crossover signal detected, False otherwise
         """
-        # Calculate EMAs
-        if not self.calculate_emas():
+        # Calculate EMAs, unless already done for this candle
+        if self._computed_at != self._current_bucket() and not self.calculate_emas():
             return False
         
-        # Detect crossover
-        signal = detect_crossover(self.ema9, self.ema20)
+        # Crossover detected by calculate_emas
+        signal = self.current_signal
         
         if signal is None:
             return False
         
-        # Store signal for use in execution
-        self.current_signal = signal
-        
         # Set side based on signal
         if signal == "BUY":
             self.side = "B"  # Long position
@@ -163,10 +284,7 @@ class EMA9_20Strategy(AdvancedStrategy):
         if self.require_confirmation:
             # Check if we had the same signal in previous candle
             if len(self.ema9) >= 3 and len(self.ema20) >= 3:
-                prev_signal = detect_crossover(
-                    self.ema9[:-1],  # Previous candles
-                    self.ema20[:-1]
-                )
+                prev_signal = detect_crossover_at(self.ema9, self.ema20, -2)  # Previous candle
                 # Only execute if signal persists for 2 candles
                 if prev_signal != signal:
                     return False
@@ -216,15 +334,16 @@ class EMA9_20Strategy(AdvancedStrategy):
         
         # Get signal info for logging
         signal_info = self.get_signal_info()
-        print(f"\n📊 EMA Signal for {self.symbol}:")
-        print(f"   Signal: {self.current_signal}")
-        print(f"   Current Price: ${signal_info.get('current_price'):,.2f}")
-        print(f"   EMA 9: ${signal_info.get('ema9'):,.2f}")
-        print(f"   EMA 20: ${signal_info.get('ema20'):,.2f}")
-        print(f"   Trend: {signal_info.get('trend')}")
+        log.info("📊 EMA Signal for %s:", self.symbol)
+        log.info("   Signal: %s", self.current_signal)
+        log.info("   Current Price: $%.2f", signal_info.get('current_price'))
+        log.info("   EMA 9: $%.2f", signal_info.get('ema9'))
+        log.info("   EMA 20: $%.2f", signal_info.get('ema20'))
+        log.info("   Trend: %s", signal_info.get('trend'))
         
-        # Execute parent strategy (sets leverage, opens position, sets TP/SL)
-        result = super().execute()
+        # Open the trade (sets leverage, opens position, sets TP/SL); the
+        # signal was already checked above, so skip the parent's re-check
+        result = self._execute_trade()
         
         # Add signal info to result
         result["signal_info"] = signal_info
@@ -247,6 +366,7 @@ class MultiAssetEMAStrategy:
         stop_loss_percent: float,
         timeframe: str = "1h",
         lookback_candles: int = 100,
+        leverages: Optional[Dict[str, int]] = None,
     ):
         """
         Initialize multi-asset EMA strategy.
@@ -260,23 +380,49 @@ class MultiAssetEMAStrategy:
             stop_loss_percent: Stop loss percentage
             timeframe: Candle interval
             lookback_candles: Number of candles to fetch
+            leverages: Optional per-symbol leverage overrides (falls back to leverage)
         """
         self.bot = bot
         self.symbols = symbols
         self.strategies = {}
         
+        leverages = leverages or {}
+        
         # Create strategy instance for each symbol
         for symbol in symbols:
             self.strategies[symbol] = EMA9_20Strategy(
                 bot=bot,
                 symbol=symbol,
                 collateral_usd=collateral_usd,
-                leverage=leverage,
+                leverage=leverages.get(symbol, leverage),
                 take_profit_percent=take_profit_percent,
                 stop_loss_percent=stop_loss_percent,
                 timeframe=timeframe,
                 lookback_candles=lookback_candles,
             )
+        
+        # Reused across checks; candle fetches are network-bound, so one
+        # worker per asset lets them all overlap
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self.strategies)),
+            thread_name_prefix="ema",
+        )
+    
+    def calculate_emas_async(self) -> Dict[str, Future]:
+        """
+        Start calculate_emas for all assets concurrently.
+        
+        Returns:
+            Dictionary mapping symbol to a Future of its calculate_emas() result
+        """
+        return {
+            symbol: self._executor.submit(strategy.calculate_emas)
+            for symbol, strategy in self.strategies.items()
+        }
+    
+    def shutdown(self):
+        """Stop the worker threads used by calculate_emas_async."""
+        self._executor.shutdown(wait=False)
     
     def check_all_signals(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -286,18 +432,20 @@ class MultiAssetEMAStrategy:
             Dictionary mapping symbol to signal info
         """
         signals = {}
+        futures = {fut: symbol for symbol, fut in self.calculate_emas_async().items()}
         
-        for symbol, strategy in self.strategies.items():
+        for fut in as_completed(futures):
+            symbol = futures[fut]
+            strategy = self.strategies[symbol]
             try:
-                # Calculate EMAs
-                strategy.calculate_emas()
+                fut.result()
                 
                 # Get signal info
                 signal_info = strategy.get_signal_info()
                 
-                # Detect crossover
+                # Crossover detected by calculate_emas
                 if strategy.ema9 and strategy.ema20:
-                    signal = detect_crossover(strategy.ema9, strategy.ema20)
+                    signal = strategy.current_signal
                     signal_info["crossover_signal"] = signal
                     signal_info["has_signal"] = signal is not None
                 
@@ -320,9 +468,9 @@ class MultiAssetEMAStrategy:
         results = {}
         
         for symbol, strategy in self.strategies.items():
-            print(f"\n{'='*60}")
-            print(f"Checking {symbol}...")
-            print(f"{'='*60}")
+            log.info(SEPARATOR)
+            log.info("Checking %s...", symbol)
+            log.info(SEPARATOR)
             
             try:
                 result = strategy.execute()
@@ -353,5 +501,56 @@ class MultiAssetEMAStrategy:
             }
         
         return self.strategies[symbol].execute()
+    
+    def save_state(self, path: str):
+        """
+        Save EMA state for all assets to a JSON file.
+        
+        The file is written to a temporary path and moved into place, so a
+        crash mid-write never leaves a corrupt state file.
+        
+        Args:
+            path: State file path
+        """
+        state = {symbol: strategy.to_state() for symbol, strategy in self.strategies.items()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    
+    def load_state(self, path: str) -> List[str]:
+        """
+        Load EMA state saved by save_state().
+        
+        Assets missing from the file, or whose saved state does not match
+        their configuration, start cold.
+        
+        Args:
+            path: State file path
+        
+        Returns:
+            List of symbols whose state was restored
+        """
+        if not os.path.exists(path):
+            return []
+        
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("⚠️  Could not read EMA state from %s: %s", path, e)
+            return []
+        
+        restored = []
+        for symbol, strategy in self.strategies.items():
+            if symbol not in state:
+                continue
+            try:
+                strategy.restore_state(state[symbol])
+                restored.append(symbol)
+            except (KeyError, TypeError, ValueError) as e:
+                log.warning("⚠️  Ignoring saved EMA state for %s: %s", symbol, e)
+        
+        return restored
 
 
@@ -3,18 +3,29 @@ Health check HTTP server to prevent Railway from sleeping.
 Runs in a separate thread and responds to health check requests.
 """
 import http.server
+import logging
 import socketserver
 import threading
 import json
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+
+class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCP server that handles each request in its own thread."""
+    daemon_threads = True
+    allow_reuse_address = True
 
 
 class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
     """HTTP handler for health check endpoints."""
     
-    def __init__(self, *args, bot_status: Optional[dict] = None, **kwargs):
-        self.bot_status = bot_status or {}
+    def __init__(self, *args, status_json: bytes = b'{}', **kwargs):
+        self.status_json = status_json
         super().__init__(*args, **kwargs)
     
     def do_GET(self):
@@ -24,15 +35,8 @@ class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
             self.send_header('Content-type', 'application/json')
             self.end_headers()
             
-            status = {
-                "status": "healthy",
-                "timestamp": datetime.now().isoformat(),
-                "bot": self.bot_status.get("status", "running"),
-                "checks": self.bot_status.get("checks", 0),
-                "last_check": self.bot_status.get("last_check", "N/A"),
-            }
-            
-            self.wfile.write(json.dumps(status, indent=2).encode())
+            # Encoded once per status update, not per request
+            self.wfile.write(self.status_json)
         elif self.path == '/ping':
             self.send_response(200)
             self.send_header('Content-type', 'text/plain')
@@ -44,11 +48,16 @@ class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
             self.end_headers()
             self.wfile.write(b'Not Found')
     
-    def log_message(self, format, *args):
+    def log_request(self, code='-', size='-'):
         """Suppress default logging."""
         # Only log errors, not every request
-        if args[1] != '200':
-            super().log_message(format, *args)
+        if isinstance(code, int) and code < 400:
+            return
+        super().log_request(code, size)
+    
+    def log_message(self, format, *args):
+        """Send request errors through logging instead of stderr."""
+        log.warning(format, *args)
 
 
 class HealthServer:
@@ -69,38 +78,86 @@ class HealthServer:
         self.bot_status = bot_status or {}
         self.server: Optional[socketserver.TCPServer] = None
         self.thread: Optional[threading.Thread] = None
+        self._status_json = self._encode_status(time.time())
     
     def start(self):
         """Start the health check server in a separate thread."""
         def create_handler(*args, **kwargs):
-            return HealthCheckHandler(*args, bot_status=self.bot_status, **kwargs)
+            return HealthCheckHandler(*args, status_json=self._status_json, **kwargs)
         
         try:
-            self.server = socketserver.TCPServer(("", self.port), create_handler)
-            self.server.allow_reuse_address = True
+            self.server = ThreadedTCPServer(("", self.port), create_handler)
             
             self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
             self.thread.start()
             
-            print(f"✅ Health check server started on port {self.port}")
-            print(f"   Health endpoint: http://0.0.0.0:{self.port}/health")
-            print(f"   Ping endpoint: http://0.0.0.0:{self.port}/ping")
+            log.info("✅ Health check server started on port %s", self.port)
+            log.info("   Health endpoint: http://0.0.0.0:%s/health", self.port)
+            log.info("   Ping endpoint: http://0.0.0.0:%s/ping", self.port)
         except Exception as e:
-            print(f"⚠️  Could not start health check server: {e}")
-            print(f"   Bot will continue running, but may sleep on Railway free tier")
+            log.warning("⚠️  Could not start health check server: %s", e)
+            log.warning("   Bot will continue running, but may sleep on Railway free tier")
     
     def stop(self):
         """Stop the health check server."""
         if self.server:
             self.server.shutdown()
             self.server.server_close()
-            print("🛑 Health check server stopped")
+            log.info("🛑 Health check server stopped")
     
-    def update_status(self, checks: int = 0, last_check: str = "N/A", status: str = "running"):
-        """Update bot status for health check endpoint."""
+    def update_status(
+        self,
+        checks: int = 0,
+        last_check: Optional[float] = None,
+        status: str = "running",
+        timestamp: Optional[float] = None,
+    ):
+        """
+        Update bot status for health check endpoint.
+        
+        Args:
+            checks: Number of checks performed
+            last_check: Unix time of the last check, or None if there was none
+            status: Bot status ("running", "stopped", "error")
+            timestamp: Unix time of the update (defaults to now), so callers
+                that already read the clock for last_check can reuse it
+        """
         self.bot_status.update({
             "status": status,
             "checks": checks,
             "last_check": last_check,
         })
+        self._status_json = self._encode_status(time.time() if timestamp is None else timestamp)
+    
+    def _encode_status(self, timestamp: float) -> bytes:
+        """Build the JSON body served by the health endpoint."""
+        # Times are kept as epoch seconds and formatted only here, once per update
+        last_check = self.bot_status.get("last_check")
+        status = {
+            "status": "healthy",
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "bot": self.bot_status.get("status", "running"),
+            "checks": self.bot_status.get("checks", 0),
+            "last_check": datetime.fromtimestamp(last_check).strftime("%Y-%m-%d %H:%M:%S") if last_check else "N/A",
+        }
+        return json.dumps(status, indent=2).encode()
+
 
+@contextmanager
+def health_server_context(port: Optional[int] = None, bot_status: Optional[dict] = None) -> Iterator[HealthServer]:
+    """
+    Run a health check server for the duration of a with block.
+    
+    Args:
+        port: Port to run the server on (see HealthServer)
+        bot_status: Dictionary to store bot status (shared reference)
+    
+    Yields:
+        The started HealthServer; it is stopped when the block exits
+    """
+    server = HealthServer(port=port, bot_status=bot_status)
+    server.start()
+    try:
+        yield server
+    finally:
+        server.stop()
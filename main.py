@@ -2,210 +2,318 @@
 Main entry point for the trading bot.
 EMA 9/20 Crossover Strategy - 15 Minute Timeframe
 """
-import os
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sched
 import sys
 import time
-from datetime import datetime
-from dotenv import load_dotenv
+from concurrent.futures import Future
+from types import MappingProxyType
+from typing import Mapping, Optional
+from config import (
+    BOOT_STAGGER_SECONDS,
+    COLLATERAL_USD,
+    EMA_STATE_FILE,
+    HEALTH_CHECK_PORT,
+    LOG_LEVEL,
+    STOP_LOSS_PERCENT,
+    SYMBOLS,
+    TAKE_PROFIT_PERCENT,
+    TIMEFRAME,
+    USE_TESTNET,
+)
 from trading_bot import TradingBot
-from ema_strategy import EMA9_20Strategy
-from health_server import HealthServer
-from technical_indicators import detect_crossover
+from ema_strategy import EMA9_20Strategy, MultiAssetEMAStrategy
+from health_server import health_server_context
+from candle_cache import TIMEFRAME_MS
 
-# Load environment variables
-load_dotenv()
+log = logging.getLogger(__name__)
 
-def main():
-    """Main entry point."""
-    print("🚀 EMA 9/20 Strategy - 15 Minute Timeframe")
-    print("=" * 60)
-    print(f"Environment: {'TESTNET' if os.getenv('USE_TESTNET', 'false').lower() == 'true' else 'MAINNET'}")
-    print()
+# Banner line around report sections
+SEPARATOR = "=" * 60
+
+# Seconds between checks for each supported timeframe (read-only)
+TIMEFRAME_SECONDS: Mapping[str, int] = MappingProxyType(
+    {timeframe: ms // 1000 for timeframe, ms in TIMEFRAME_MS.items()}
+)
+
+# Extra wait after a candle closes so the exchange has published it
+CANDLE_CLOSE_GRACE_SECONDS = 2
+
+
+def next_check_time(interval_seconds: int, previous_target: Optional[float] = None) -> float:
+    """
+    Get the wall-clock time of the next check, just after the next candle close.
     
-    # Initialize bot
-    bot = TradingBot()
-    print(f"✅ Bot initialized")
-    print(f"Wallet: {bot.get_wallet_address()}")
-    print()
+    Targets are chained from the previous one, so scheduling error never
+    accumulates. If a check overran its whole interval, skip to the next
+    close that is still in the future instead of running back-to-back.
+    
+    Args:
+        interval_seconds: Candle interval in seconds
+        previous_target: Target time of the check that just ran, if any
+    
+    Returns:
+        Unix timestamp to run the next check at
+    """
+    now = time.time()
+    if previous_target is not None:
+        target = previous_target + interval_seconds
+        if target > now:
+            return target
+    
+    return (now // interval_seconds + 1) * interval_seconds + CANDLE_CLOSE_GRACE_SECONDS
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Configure logging to stdout through a background thread.
+    
+    Log calls only put the record on a queue; a listener thread formats it
+    and writes it to stdout, so the trading loop never blocks on output.
+    The listener is stopped at interpreter exit, after everything (including
+    the health server's stop message) has logged, so no queued record is lost.
     
-    # Strategy parameters from environment variables
-    symbols_str = os.getenv("SYMBOLS", "ETH,SOL,BTC")
-    symbols = [s.strip() for s in symbols_str.split(",")]
+    Returns:
+        The running listener. Call listener.queue.join() to wait until all
+        queued records are written.
+    """
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
     
-    # Parse numeric values, stripping quotes if present
-    def parse_float(env_var, default):
-        value = os.getenv(env_var, str(default))
-        # Remove quotes if present
-        value = value.strip('"\'')
-        return float(value)
+    log_queue = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
     
-    collateral_usd = parse_float("COLLATERAL_USD", 25.0)
-    sl_percent = parse_float("STOP_LOSS_PERCENT", 30.0)
-    tp_percent = parse_float("TAKE_PROFIT_PERCENT", 100.0)
-    timeframe = os.getenv("TIMEFRAME", "15m").strip('"\'')
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def check_symbol(
+    symbol: str,
+    strategy: EMA9_20Strategy,
+    emas_ready: Future,
+):
+    """
+    Run one check for a symbol: log its EMAs and trade on a crossover.
     
-    # Get maximum leverage for each asset
-    print(f"📊 Getting maximum leverage for each asset...")
-    asset_leverages = {}
-    for symbol in symbols:
-        max_lev = bot.get_max_leverage(symbol)
-        if max_lev:
-            asset_leverages[symbol] = max_lev
-            print(f"   {symbol}: {max_lev}x")
+    Args:
+        symbol: Trading symbol
+        strategy: Strategy instance for the symbol
+        emas_ready: Future of the strategy's calculate_emas() call for this check
+    """
+    try:
+        # Wait for this symbol's EMAs (calculated concurrently for all symbols)
+        if emas_ready.result():
+            signal_info = strategy.get_signal_info()
+            trend = signal_info.get("trend", "N/A")
+            ema9 = signal_info.get("ema9", 0)
+            ema20 = signal_info.get("ema20", 0)
+            current_price = signal_info.get("current_price", 0)
+            
+            log.info("📊 %s:", symbol)
+            log.info("   Price: $%.2f", current_price)
+            log.info("   EMA 9: $%.2f", ema9)
+            log.info("   EMA 20: $%.2f", ema20)
+            log.info("   Trend: %s", trend)
+            
+            # Crossover detected by calculate_emas
+            crossover = strategy.current_signal
+            log.info("   Crossover Signal: %s", crossover if crossover else 'None')
         else:
-            asset_leverages[symbol] = 20
-            print(f"   {symbol}: 20x (fallback)")
+            log.info("📊 %s:", symbol)
+            log.info("   ⚠️  Could not calculate EMAs - insufficient data")
+            crossover = None
+        
+        # Execute if crossover detected
+        if crossover and strategy.should_execute():
+            log.info("   ✅ CROSSOVER DETECTED! Executing trade...")
+            
+            result = strategy.execute()
+            
+            if result.get("success"):
+                log.info("   ✅ Trade executed successfully!")
+                
+                pos = result.get("position", {})
+                order = result.get("order", {})
+                
+                log.info("   Entry Price: $%.2f", pos.get('entry_price', 0))
+                log.info("   Position Size: %.6f %s", pos.get('position_size', 0), symbol)
+                
+                if order.get("order_id"):
+                    log.info("   Order ID: %s", order.get('order_id'))
+                
+                tp = result.get("take_profit", {})
+                sl = result.get("stop_loss", {})
+                
+                if tp.get("success"):
+                    tp_price = tp.get("tp_price", 0)
+                    log.info("   ✅ TP Set: %s%% ($%.2f)", tp.get('tp_percent'), tp_price)
+                else:
+                    tp_error = tp.get("error", "Unknown error")
+                    log.warning("   ⚠️  TP Failed: %s", tp_error)
+                
+                if sl.get("success"):
+                    sl_price = sl.get("sl_price", 0)
+                    log.info("   ✅ SL Set: %s%% ($%.2f)", sl.get('sl_percent'), sl_price)
+                else:
+                    sl_error = sl.get("error", "Unknown error")
+                    log.warning("   ⚠️  SL Failed: %s", sl_error)
+            else:
+                # "reason" explains machine-readable errors such as "risk_halted"
+                error = result.get("reason") or result.get("error", "Unknown error")
+                log.error("   ❌ Execution failed: %s", error)
+        else:
+            log.info("   ℹ️  No crossover - waiting for signal")
     
-    print()
-    print(f"📊 Strategy Configuration:")
-    print(f"   Symbols: {', '.join(symbols)}")
-    print(f"   Timeframe: {timeframe}")
-    print(f"   Collateral per asset: ${collateral_usd}")
-    print(f"   Leverage: Using maximum per asset (see above)")
-    print(f"   Stop Loss: {sl_percent}%")
-    print(f"   Take Profit: {tp_percent}%")
-    print()
+    except Exception as e:
+        # Per-symbol errors can repeat every check during an outage, so only
+        # pay for the traceback when debugging
+        log.error("   ❌ Error processing %s: %s", symbol, e, exc_info=log.isEnabledFor(logging.DEBUG))
+
+
+def main():
+    """Main entry point."""
+    setup_logging()
     
-    # Start health check server
-    health_port = int(os.getenv("HEALTH_CHECK_PORT", os.getenv("PORT", "8080")))
-    bot_status = {}
-    health_server = HealthServer(port=health_port, bot_status=bot_status)
-    health_server.start()
+    log.info("🚀 EMA 9/20 Strategy - 15 Minute Timeframe")
+    log.info(SEPARATOR)
+    log.info("Environment: %s", 'TESTNET' if USE_TESTNET else 'MAINNET')
     
-    print(f"🔄 Running in continuous mode - checking every {timeframe}")
-    print(f"   Press Ctrl+C to stop")
-    print()
+    # Spread the startup burst of meta/state requests when several bots
+    # share an IP and restart together
+    if BOOT_STAGGER_SECONDS > 0:
+        delay = random.uniform(0, BOOT_STAGGER_SECONDS)
+        log.info("⏳ Staggering startup by %.1fs", delay)
+        time.sleep(delay)
     
-    check_count = 0
+    # Initialize bot
+    bot = TradingBot()
+    log.info("✅ Bot initialized")
+    log.info("Wallet: %s", bot.get_wallet_address())
     
+    # The WebSocket threads keep the process alive until the bot is closed,
+    # so close it however main() exits
+    mstrat: Optional[MultiAssetEMAStrategy] = None
     try:
-        while True:
-            check_count += 1
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            print(f"\n{'='*60}")
-            print(f"⏰ Check #{check_count} - {current_time}")
-            print(f"{'='*60}")
+        # Strategy parameters (parsed from the environment by config)
+        symbols = SYMBOLS
+        collateral_usd = COLLATERAL_USD
+        sl_percent = STOP_LOSS_PERCENT
+        tp_percent = TAKE_PROFIT_PERCENT
+        timeframe = TIMEFRAME
+        
+        # Get maximum leverage for each asset
+        log.info("📊 Getting maximum leverage for each asset...")
+        asset_leverages = {}
+        max_leverages = bot.get_max_leverages(symbols)
+        for symbol in symbols:
+            max_lev = max_leverages.get(symbol)
+            if max_lev:
+                asset_leverages[symbol] = max_lev
+                log.info("   %s: %sx", symbol, max_lev)
+            else:
+                asset_leverages[symbol] = 20
+                log.info("   %s: 20x (fallback)", symbol)
+        
+        log.info("📊 Strategy Configuration:")
+        log.info("   Symbols: %s", ', '.join(symbols))
+        log.info("   Timeframe: %s", timeframe)
+        log.info("   Collateral per asset: $%s", collateral_usd)
+        log.info("   Leverage: Using maximum per asset (see above)")
+        log.info("   Stop Loss: %s%%", sl_percent)
+        log.info("   Take Profit: %s%%", tp_percent)
+        
+        # Build strategies once so EMA state and caches survive across checks
+        mstrat = MultiAssetEMAStrategy(
+            bot=bot,
+            symbols=symbols,
+            collateral_usd=collateral_usd,
+            leverage=20,
+            take_profit_percent=tp_percent,
+            stop_loss_percent=sl_percent,
+            timeframe=timeframe,
+            leverages=asset_leverages,
+        )
+        
+        # Resume EMAs from the last run instead of rebuilding them from candles
+        state_file = EMA_STATE_FILE
+        restored = mstrat.load_state(state_file)
+        if restored:
+            log.info("💾 Restored EMA state for: %s", ', '.join(restored))
+        
+        # Start health check server (stopped when the block exits)
+        with health_server_context(port=HEALTH_CHECK_PORT) as health_server:
+            log.info("🔄 Running in continuous mode - checking every %s", timeframe)
+            log.info("   Press Ctrl+C to stop")
             
-            # Update health check status
-            health_server.update_status(
-                checks=check_count,
-                last_check=current_time,
-                status="running"
-            )
+            scheduler = sched.scheduler(time.time, time.sleep)
+            check_count = 0
+            timeframe_seconds = TIMEFRAME_SECONDS.get(timeframe, 900)
             
-            # Check each symbol
-            for symbol in symbols:
+            def run_check(target: Optional[float] = None):
+                """Run one check across all symbols, then schedule the next one."""
+                nonlocal check_count
+                check_count += 1
+                # Log records carry their own formatted time, so the check only
+                # needs the raw clock value
+                now = time.time()
+                
+                log.info(SEPARATOR)
+                log.info("⏰ Check #%d", check_count)
+                log.info(SEPARATOR)
+                if target is not None:
+                    log.info("   Scheduling drift: %+.3fs", now - target)
+                
+                # Update health check status
+                health_server.update_status(
+                    checks=check_count,
+                    last_check=now,
+                    status="running",
+                    timestamp=now,
+                )
+                
+                # Fetch candles and update EMAs for all symbols at once, then log and
+                # trade one symbol at a time so output and orders stay sequential
+                emas_ready = mstrat.calculate_emas_async()
+                for symbol, strategy in mstrat.strategies.items():
+                    check_symbol(symbol, strategy, emas_ready[symbol])
+                
                 try:
-                    leverage = asset_leverages.get(symbol, 20)
-                    
-                    # Create EMA strategy
-                    strategy = EMA9_20Strategy(
-                        bot=bot,
-                        symbol=symbol,
-                        collateral_usd=collateral_usd,
-                        leverage=leverage,
-                        take_profit_percent=tp_percent,
-                        stop_loss_percent=sl_percent,
-                        timeframe=timeframe,
-                    )
-                    
-                    # Calculate EMAs
-                    if strategy.calculate_emas():
-                        signal_info = strategy.get_signal_info()
-                        trend = signal_info.get("trend", "N/A")
-                        ema9 = signal_info.get("ema9", 0)
-                        ema20 = signal_info.get("ema20", 0)
-                        current_price = signal_info.get("current_price", 0)
-                        
-                        print(f"\n📊 {symbol}:")
-                        print(f"   Price: ${current_price:,.2f}")
-                        print(f"   EMA 9: ${ema9:,.2f}")
-                        print(f"   EMA 20: ${ema20:,.2f}")
-                        print(f"   Trend: {trend}")
-                        
-                        # Detect crossover
-                        if strategy.ema9 and strategy.ema20:
-                            crossover = detect_crossover(strategy.ema9, strategy.ema20)
-                            print(f"   Crossover Signal: {crossover if crossover else 'None'}")
-                        else:
-                            crossover = None
-                            print(f"   Crossover Signal: None (insufficient data)")
-                    else:
-                        print(f"\n📊 {symbol}:")
-                        print(f"   ⚠️  Could not calculate EMAs - insufficient data")
-                        crossover = None
-                    
-                    # Execute if crossover detected
-                    if crossover and strategy.should_execute():
-                        print(f"   ✅ CROSSOVER DETECTED! Executing trade...")
-                        
-                        result = strategy.execute()
-                        
-                        if result.get("success"):
-                            print(f"   ✅ Trade executed successfully!")
-                            
-                            pos = result.get("position", {})
-                            order = result.get("order", {})
-                            
-                            print(f"   Entry Price: ${pos.get('entry_price', 0):,.2f}")
-                            print(f"   Position Size: {pos.get('position_size', 0):.6f} {symbol}")
-                            
-                            if order.get("order_id"):
-                                print(f"   Order ID: {order.get('order_id')}")
-                            
-                            tp = result.get("take_profit", {})
-                            sl = result.get("stop_loss", {})
-                            
-                            if tp.get("success"):
-                                tp_price = tp.get("tp_price", 0)
-                                print(f"   ✅ TP Set: {tp.get('tp_percent')}% (${tp_price:,.2f})")
-                            else:
-                                tp_error = tp.get("error", "Unknown error")
-                                print(f"   ⚠️  TP Failed: {tp_error}")
-                            
-                            if sl.get("success"):
-                                sl_price = sl.get("sl_price", 0)
-                                print(f"   ✅ SL Set: {sl.get('sl_percent')}% (${sl_price:,.2f})")
-                            else:
-                                sl_error = sl.get("error", "Unknown error")
-                                print(f"   ⚠️  SL Failed: {sl_error}")
-                        else:
-                            error = result.get("error", "Unknown error")
-                            print(f"   ❌ Execution failed: {error}")
-                    else:
-                        print(f"   ℹ️  No crossover - waiting for signal")
+                    mstrat.save_state(state_file)
+                except OSError as e:
+                    log.warning("⚠️  Could not save EMA state to %s: %s", state_file, e)
+                
+                # Wake up just after the next candle closes instead of after a fixed
+                # interval, so time spent on this check doesn't push later checks back
+                next_target = next_check_time(timeframe_seconds, target)
+                scheduler.enterabs(next_target, 1, run_check, (next_target,))
                 
-                except Exception as e:
-                    print(f"   ❌ Error processing {symbol}: {e}")
-                    import traceback
-                    traceback.print_exc()
+                log.info("⏳ Waiting %.0fs until next %s candle...", next_target - time.time(), timeframe)
             
-            # Wait for next check
-            timeframe_seconds = {
-                "15m": 900,
-                "30m": 1800,
-                "1h": 3600,
-                "4h": 14400,
-                "1d": 86400,
-            }.get(timeframe, 900)
+            try:
+                run_check()
+                scheduler.run()
             
-            print(f"\n⏳ Waiting {timeframe} until next check...")
-            time.sleep(timeframe_seconds)
-    
-    except KeyboardInterrupt:
-        print(f"\n\n🛑 Stopped by user")
-        print(f"   Total checks performed: {check_count}")
-        health_server.update_status(status="stopped")
-        health_server.stop()
-        print(f"   Bot stopped")
-    except Exception as e:
-        print(f"\n❌ Fatal error: {e}")
-        health_server.update_status(status="error")
-        health_server.stop()
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+            except KeyboardInterrupt:
+                log.info("🛑 Stopped by user")
+                log.info("   Total checks performed: %d", check_count)
+                health_server.update_status(status="stopped")
+                log.info("   Bot stopped")
+            except Exception as e:
+                log.exception("❌ Fatal error: %s", e)
+                health_server.update_status(status="error")
+                sys.exit(1)
+    finally:
+        if mstrat is not None:
+            mstrat.shutdown()
+        bot.close()
 
 
 if __name__ == "__main__":
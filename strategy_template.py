@@ -1,16 +1,36 @@
 """
 Template for creating custom trading strategies with collateral, leverage, TP, and SL.
 """
+import logging
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
-from trading_bot import TradingBot
+from trading_bot import WS_MIDS_MAX_AGE, TradingBot, extract_order_error, retry_with_backoff
+
+log = logging.getLogger(__name__)
 
 
 class AdvancedStrategy(ABC):
     """
     Advanced strategy template with collateral, leverage, TP, and SL support.
+    
+    Subclasses must declare __slots__ for any attributes they add.
     """
     
+    __slots__ = (
+        "bot",
+        "name",
+        "symbol",
+        "collateral_usd",
+        "leverage",
+        "take_profit_percent",
+        "stop_loss_percent",
+        "side",
+        "entry_price",
+        "position_size",
+    )
+    
     def __init__(
         self,
         bot: TradingBot,
@@ -72,54 +92,123 @@ class AdvancedStrategy(ABC):
                 "strategy": self.name,
             }
         
+        return self._execute_trade()
+    
+    def _risk_ok(self, withdrawable: Optional[float]) -> bool:
+        """
+        Check that the account can cover this trade's collateral.
+        
+        Args:
+            withdrawable: Free margin in USD (from bot.get_withdrawable()), or None if unknown
+        
+        Returns:
+            False only if the free margin is known to be too low
+        """
+        if withdrawable is None or withdrawable >= self.collateral_usd:
+            return True
+        
+        log.warning(
+            "   ⚠️  Skipping %s trade: $%.2f free margin, $%.2f collateral needed",
+            self.symbol,
+            withdrawable,
+            self.collateral_usd,
+        )
+        return False
+    
+    def _set_leverage(self) -> Dict[str, Any]:
+        """
+        Set the strategy's leverage, falling back to at most 20x if it is rejected.
+        
+        Returns:
+            Response dictionary from set_leverage (treated as successful if
+            neither attempt worked, since leverage may already be set)
+        """
+        log.info("📊 Setting leverage to %sx for %s...", self.leverage, self.symbol)
+        leverage_result = self.bot.set_leverage(self.symbol, self.leverage)
+        if not leverage_result.get("success"):
+            # Try with lower leverage if high leverage fails
+            error_msg = leverage_result.get("error") or leverage_result.get("response", {}).get("response", "Unknown")
+            log.warning("   ⚠️  Failed to set %sx leverage: %s", self.leverage, error_msg)
+            
+            # Try maximum allowed leverage (usually 20x for most assets)
+            max_leverage = min(self.leverage, 20)  # Hyperliquid typically allows up to 20x
+            log.info("   Trying %sx leverage instead...", max_leverage)
+            leverage_result = self.bot.set_leverage(self.symbol, max_leverage)
+            
+            if leverage_result.get("success"):
+                self.leverage = max_leverage
+                log.info("   ✅ Set leverage to %sx (maximum allowed)", max_leverage)
+            else:
+                # Continue anyway - leverage might already be set or not critical
+                log.warning("   ⚠️  Continuing without setting leverage (may already be set)")
+                leverage_result = {"success": True, "response": {"status": "ok"}}
+        
+        return leverage_result
+    
+    def _execute_trade(self) -> Dict[str, Any]:
+        """
+        Open the position and set TP/SL, without checking should_execute().
+        
+        Subclasses that have already evaluated their entry conditions can call
+        this directly instead of execute() to avoid evaluating them twice.
+        
+        Returns:
+            Response dictionary with execution details
+        """
         try:
-            # Step 1: Set leverage
-            print(f"📊 Setting leverage to {self.leverage}x for {self.symbol}...")
-            leverage_result = self.bot.set_leverage(self.symbol, self.leverage)
-            if not leverage_result.get("success"):
-                # Try with lower leverage if high leverage fails
-                error_msg = leverage_result.get("error") or leverage_result.get("response", {}).get("response", "Unknown")
-                print(f"   ⚠️  Failed to set {self.leverage}x leverage: {error_msg}")
+            # Step 1: Check the free margin, then set leverage while the entry
+            # price is fetched; the price request doesn't depend on either
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                price_future = pool.submit(self.bot.get_price_snapshot, self.symbol)
+                margin_future = pool.submit(self.bot.get_withdrawable)
                 
-                # Try maximum allowed leverage (usually 20x for most assets)
-                max_leverage = min(self.leverage, 20)  # Hyperliquid typically allows up to 20x
-                print(f"   Trying {max_leverage}x leverage instead...")
-                leverage_result = self.bot.set_leverage(self.symbol, max_leverage)
+                # Don't touch the account (not even its leverage) for a trade
+                # it can't fund
+                if not self._risk_ok(margin_future.result()):
+                    return {
+                        "success": False,
+                        "error": "risk_halted",
+                        "reason": f"Insufficient margin for ${self.collateral_usd} collateral",
+                        "strategy": self.name,
+                    }
                 
-                if leverage_result.get("success"):
-                    self.leverage = max_leverage
-                    print(f"   ✅ Set leverage to {max_leverage}x (maximum allowed)")
-                else:
-                    # Continue anyway - leverage might already be set or not critical
-                    print(f"   ⚠️  Continuing without setting leverage (may already be set)")
-                    leverage_result = {"success": True, "response": {"status": "ok"}}
+                leverage_result = self._set_leverage()
             
             # Step 2: Get current price and calculate position size
-            print(f"💰 Calculating position size...")
-            self.entry_price = self.bot.get_current_price(self.symbol)
-            if self.entry_price is None:
+            log.info("💰 Calculating position size...")
+            snapshot = price_future.result()
+            if snapshot is not None and time.monotonic() - snapshot[1] > WS_MIDS_MAX_AGE:
+                # The price was already cached, or setting leverage took long
+                # (e.g. rate-limit backoff); size and anchor slippage to a fresh one
+                snapshot = self.bot.get_price_snapshot(self.symbol)
+            if snapshot is None:
                 return {
                     "success": False,
                     "error": f"Could not get current price for {self.symbol}",
                     "strategy": self.name,
                 }
+            self.entry_price, priced_at = snapshot
             
-            self.position_size = self.bot.calculate_position_size(
+            entry = self.bot.prepare_market_entry(
                 self.symbol,
                 self.collateral_usd,
-                self.leverage
+                self.leverage,
+                price=self.entry_price,
+                priced_at=priced_at,
             )
+            self.position_size = entry.size
             
-            print(f"   Entry Price: ${self.entry_price:,.2f}")
-            print(f"   Position Size: {self.position_size:.6f} {self.symbol}")
-            print(f"   Position Value: ${self.collateral_usd * self.leverage:,.2f}")
+            log.info("   Entry Price: $%.2f", self.entry_price)
+            log.info("   Position Size: %.6f %s", self.position_size, self.symbol)
+            log.info("   Position Value: $%.2f", self.collateral_usd * self.leverage)
             
             # Step 3: Place market order
-            print(f"📈 Placing market order...")
+            log.info("📈 Placing market order...")
             order_result = self.bot.create_market_order(
                 symbol=self.symbol,
                 side=self.side,
-                amount=str(self.position_size),
+                amount=entry.amount,
+                entry=entry,
             )
             
             if not order_result.get("success"):
@@ -128,91 +217,82 @@ class AdvancedStrategy(ABC):
                     "strategy": self.name,
                 }
             
-            # Step 4: Wait a moment for position to be confirmed and get actual position size
-            import time
-            print(f"⏳ Waiting 2 seconds for position confirmation...")
-            time.sleep(2)
-            
-            # Get actual position size (may differ slightly due to slippage)
-            actual_position_size = self.bot.get_position_size(self.symbol)
+            # Step 4: Get actual position size (may differ slightly due to slippage).
+            # A filled market order reports it; otherwise wait for the position
+            actual_position_size = order_result.get("filled_size")
+            if actual_position_size is None:
+                log.info("⏳ Waiting for position confirmation...")
+                actual_position_size = self.bot.wait_for_position(self.symbol)
             if actual_position_size:
-                print(f"   Actual position size: {actual_position_size:.6f} {self.symbol}")
+                log.info("   Actual position size: %.6f %s", actual_position_size, self.symbol)
                 # Use actual position size for TP/SL
                 position_size_for_tpsl = actual_position_size
             else:
-                print(f"   ⚠️  Could not get actual position size, using calculated size")
+                log.warning("   ⚠️  Could not get actual position size, using calculated size")
                 position_size_for_tpsl = self.position_size
             
-            # Step 5: Set take profit (with retry)
+            # Step 5: Set take profit and stop loss with one signed request.
+            # Prices are computed (and rounded to the exchange's precision) once
             is_long = self.side == "B"
-            print(f"🎯 Setting take profit at {self.take_profit_percent}%...")
-            tp_result = None
-            for attempt in range(3):
-                if attempt > 0:
-                    print(f"   Retry {attempt}/2...")
-                    time.sleep(1)
-                tp_result = self.bot.set_take_profit(
+            tp_price = self.bot.get_trigger_price(self.symbol, self.entry_price, self.take_profit_percent, "tp", is_long)
+            sl_price = self.bot.get_trigger_price(self.symbol, self.entry_price, self.stop_loss_percent, "sl", is_long)
+            log.info(
+                "🎯 Setting take profit at %s%% and stop loss at %s%%...",
+                self.take_profit_percent,
+                self.stop_loss_percent,
+            )
+            tpsl_result = self.bot.set_tp_sl(
+                self.symbol,
+                self.entry_price,
+                position_size_for_tpsl,
+                self.take_profit_percent,
+                self.stop_loss_percent,
+                is_long=is_long,
+                tp_price=tp_price,
+                sl_price=sl_price,
+            )
+            tp_result = tpsl_result["take_profit"]
+            sl_result = tpsl_result["stop_loss"]
+            
+            # Step 6: Retry a rejected leg on its own
+            tp_result = retry_with_backoff(
+                lambda: self.bot.set_take_profit(
                     self.symbol,
                     self.entry_price,
                     position_size_for_tpsl,
                     self.take_profit_percent,
-                    is_long=is_long
-                )
-                if tp_result.get("success"):
-                    break
-            
-            if not tp_result or not tp_result.get("success"):
-                error_msg = tp_result.get("error", "Unknown error") if tp_result else "No response"
-                response = tp_result.get("response", {}) if tp_result else {}
-                if isinstance(response, dict):
-                    statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-                    if statuses and "error" in statuses[0]:
-                        error_msg = statuses[0]["error"]
-                print(f"   ❌ TP failed after retries: {error_msg}")
-                if response:
-                    print(f"   Response: {response}")
-            else:
-                tp_price = tp_result.get("tp_price", self.entry_price * (1 + self.take_profit_percent / 100) if is_long else self.entry_price * (1 - self.take_profit_percent / 100))
-                print(f"   ✅ TP set at ${tp_price:,.2f}")
-            
-            # Step 6: Set stop loss (with retry)
-            print(f"🛡️  Setting stop loss at {self.stop_loss_percent}%...")
-            sl_result = None
-            for attempt in range(3):
-                if attempt > 0:
-                    print(f"   Retry {attempt}/2...")
-                    time.sleep(1)
-                sl_result = self.bot.set_stop_loss(
+                    is_long=is_long,
+                    price=tp_price,
+                ),
+                tp_result,
+                label="TP",
+            )
+            sl_result = retry_with_backoff(
+                lambda: self.bot.set_stop_loss(
                     self.symbol,
                     self.entry_price,
                     position_size_for_tpsl,
                     self.stop_loss_percent,
-                    is_long=is_long
-                )
-                if sl_result.get("success"):
-                    break
+                    is_long=is_long,
+                    price=sl_price,
+                ),
+                sl_result,
+                label="SL",
+            )
             
-            if not sl_result or not sl_result.get("success"):
-                error_msg = sl_result.get("error", "Unknown error") if sl_result else "No response"
-                response = sl_result.get("response", {}) if sl_result else {}
-                if isinstance(response, dict):
-                    statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-                    if statuses and "error" in statuses[0]:
-                        error_msg = statuses[0]["error"]
-                print(f"   ❌ SL failed after retries: {error_msg}")
-                if response:
-                    print(f"   Response: {response}")
+            if not tp_result.get("success"):
+                log.error("   ❌ TP failed after retries: %s", extract_order_error(tp_result))
+                if tp_result.get("response"):
+                    log.debug("   Response: %s", tp_result["response"])
             else:
-                sl_price = sl_result.get("sl_price", self.entry_price * (1 - self.stop_loss_percent / 100) if is_long else self.entry_price * (1 + self.stop_loss_percent / 100))
-                print(f"   ✅ SL set at ${sl_price:,.2f}")
+                log.info("   ✅ TP set at $%.2f", tp_price)
             
-            # Calculate TP/SL prices for display (corrected for long/short)
-            if is_long:
-                tp_price = self.entry_price * (1 + self.take_profit_percent / 100)
-                sl_price = self.entry_price * (1 - self.stop_loss_percent / 100)
+            if not sl_result.get("success"):
+                log.error("   ❌ SL failed after retries: %s", extract_order_error(sl_result))
+                if sl_result.get("response"):
+                    log.debug("   Response: %s", sl_result["response"])
             else:
-                tp_price = self.entry_price * (1 - self.take_profit_percent / 100)
-                sl_price = self.entry_price * (1 + self.stop_loss_percent / 100)
+                log.info("   ✅ SL set at $%.2f", sl_price)
             
             return {
                 "success": True,
@@ -256,6 +336,8 @@ class SimpleLongStrategy(AdvancedStrategy):
     Simple example strategy that opens a long position with TP and SL.
     """
     
+    __slots__ = ()
+    
     def __init__(
         self,
         bot: TradingBot,
@@ -286,6 +368,8 @@ class SimpleShortStrategy(AdvancedStrategy):
     Simple example strategy that opens a short position with TP and SL.
     """
     
+    __slots__ = ()
+    
     def __init__(
         self,
         bot: TradingBot,
@@ -316,6 +400,8 @@ class ConditionalAdvancedStrategy(AdvancedStrategy):
     Example strategy that executes based on a condition function.
     """
     
+    __slots__ = ("condition_func", "_last_condition_error")
+    
     def __init__(
         self,
         bot: TradingBot,
@@ -342,6 +428,9 @@ class ConditionalAdvancedStrategy(AdvancedStrategy):
             side: "B" for buy, "A" for sell
             name: Strategy name
         """
+        if not callable(condition_func):
+            raise TypeError(f"condition_func must be callable, got {type(condition_func).__name__}")
+        
         super().__init__(
             bot=bot,
             name=name,
@@ -353,12 +442,20 @@ class ConditionalAdvancedStrategy(AdvancedStrategy):
             side=side,
         )
         self.condition_func = condition_func
+        self._last_condition_error: Optional[str] = None
     
     def should_execute(self) -> bool:
         """Execute based on condition function."""
         try:
-            return self.condition_func()
+            result = self.condition_func()
         except Exception as e:
-            print(f"Error in condition function: {e}")
+            # Report each distinct error once, not on every poll
+            error = f"{type(e).__name__}: {e}"
+            if error != self._last_condition_error:
+                log.warning("Error in condition function: %s", e)
+                self._last_condition_error = error
             return False
+        
+        self._last_condition_error = None
+        return result
 
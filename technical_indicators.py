@@ -19,22 +19,55 @@ def calculate_ema(prices: List[float], period: int) -> List[float]:
     if len(prices) < period:
         return [None] * len(prices)
     
-    ema_values = []
     multiplier = 2.0 / (period + 1)
     
     # First EMA value is SMA of first 'period' prices
-    sma = sum(prices[:period]) / period
-    ema_values.extend([None] * (period - 1))  # No EMA for first period-1 values
-    ema_values.append(sma)
+    ema = sum(prices[:period]) / period
+    ema_values = [None] * len(prices)  # No EMA for first period-1 values
+    ema_values[period - 1] = ema
     
-    # Calculate subsequent EMA values
+    # Calculate subsequent EMA values, carrying the previous value in a local
     for i in range(period, len(prices)):
-        ema = (prices[i] - ema_values[i - 1]) * multiplier + ema_values[i - 1]
-        ema_values.append(ema)
+        ema = (prices[i] - ema) * multiplier + ema
+        ema_values[i] = ema
     
     return ema_values
 
 
+def _crossover_signal(
+    prev_fast: Optional[float],
+    prev_slow: Optional[float],
+    current_fast: Optional[float],
+    current_slow: Optional[float],
+) -> Optional[str]:
+    """
+    Classify a crossover from the previous and current fast/slow EMA values.
+    
+    Args:
+        prev_fast: Fast EMA on the previous candle
+        prev_slow: Slow EMA on the previous candle
+        current_fast: Fast EMA on the current candle
+        current_slow: Slow EMA on the current candle
+    
+    Returns:
+        "BUY", "SELL", or None (also None if any value is missing)
+    """
+    # Check for None values
+    # Identity checks, without building a list to scan on every call
+    if current_fast is None or current_slow is None or prev_fast is None or prev_slow is None:
+        return None
+    
+    # Bullish crossover: fast EMA crosses above slow EMA
+    if prev_fast <= prev_slow and current_fast > current_slow:
+        return "BUY"
+    
+    # Bearish crossover: fast EMA crosses below slow EMA
+    if prev_fast >= prev_slow and current_fast < current_slow:
+        return "SELL"
+    
+    return None
+
+
 def detect_crossover(ema_fast: List[float], ema_slow: List[float]) -> Optional[str]:
     """
     Detect EMA crossover signal.
@@ -57,19 +90,36 @@ def detect_crossover(ema_fast: List[float], ema_slow: List[float]) -> Optional[s
     prev_fast = ema_fast[-2]
     prev_slow = ema_slow[-2]
     
-    # Check for None values
-    if None in [current_fast, current_slow, prev_fast, prev_slow]:
-        return None
+    return _crossover_signal(prev_fast, prev_slow, current_fast, current_slow)
+
+
+def detect_crossover_at(ema_fast: List[float], ema_slow: List[float], i: int) -> Optional[str]:
+    """
+    Detect EMA crossover signal at a given index, without slicing the lists.
     
-    # Bullish crossover: fast EMA crosses above slow EMA
-    if prev_fast <= prev_slow and current_fast > current_slow:
-        return "BUY"
+    detect_crossover_at(fast, slow, -1) is equivalent to detect_crossover(fast, slow),
+    and index -2 gives the signal as of the previous candle.
     
-    # Bearish crossover: fast EMA crosses below slow EMA
-    if prev_fast >= prev_slow and current_fast < current_slow:
-        return "SELL"
+    Args:
+        ema_fast: Fast EMA values (e.g., EMA 9)
+        ema_slow: Slow EMA values (e.g., EMA 20)
+        i: Index of the candle to check (negative indices count from the end)
     
-    return None
+    Returns:
+        "BUY", "SELL", or None (same as detect_crossover)
+    """
+    n = min(len(ema_fast), len(ema_slow))
+    if i < 0:
+        i += n
+    if i < 1 or i >= n:
+        return None
+    
+    current_fast = ema_fast[i]
+    current_slow = ema_slow[i]
+    prev_fast = ema_fast[i - 1]
+    prev_slow = ema_slow[i - 1]
+    
+    return _crossover_signal(prev_fast, prev_slow, current_fast, current_slow)
 
 
 def get_current_ema_values(ema_fast: List[float], ema_slow: List[float]) -> Tuple[Optional[float], Optional[float]]:
@@ -132,7 +182,8 @@ def calculate_rsi(prices: List[float], period: int = 14) -> List[Optional[float]
     if len(prices) < period + 1:
         return [None] * len(prices)
     
-    rsi_values = [None] * period
+    # Results are written by index into a list preallocated with None for the warm-up bars
+    rsi_values: List[Optional[float]] = [None] * len(prices)
     
     # Calculate price changes
     deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
@@ -151,7 +202,7 @@ def calculate_rsi(prices: List[float], period: int = 14) -> List[Optional[float]
     else:
         rs = avg_gain / avg_loss
         rsi = 100 - (100 / (1 + rs))
-    rsi_values.append(rsi)
+    rsi_values[period] = rsi
     
     # Calculate subsequent RSI values using Wilder's smoothing
     for i in range(period + 1, len(prices)):
@@ -168,7 +219,7 @@ def calculate_rsi(prices: List[float], period: int = 14) -> List[Optional[float]
             rs = avg_gain / avg_loss
             rsi = 100 - (100 / (1 + rs))
         
-        rsi_values.append(rsi)
+        rsi_values[i] = rsi
     
     return rsi_values
 
@@ -190,7 +241,7 @@ def calculate_atr(highs: List[float], lows: List[float], closes: List[float], pe
         return [None] * len(highs)
     
     # Calculate True Range (TR)
-    tr_values = []
+    tr_values = [0.0] * len(highs)
     for i in range(len(highs)):
         if i == 0:
             tr = highs[i] - lows[i]
@@ -199,21 +250,21 @@ def calculate_atr(highs: List[float], lows: List[float], closes: List[float], pe
             tr2 = abs(highs[i] - closes[i-1])
             tr3 = abs(lows[i] - closes[i-1])
             tr = max(tr1, tr2, tr3)
-        tr_values.append(tr)
+        tr_values[i] = tr
     
-    # Calculate ATR using Wilder's smoothing
-    atr_values = [None] * period
+    # Calculate ATR using Wilder's smoothing (None for the warm-up bars)
+    atr_values: List[Optional[float]] = [None] * len(tr_values)
     
     # Initial ATR is SMA of first period TR values
     initial_atr = sum(tr_values[:period]) / period
-    atr_values.append(initial_atr)
+    atr_values[period] = initial_atr
     
     # Calculate subsequent ATR values using Wilder's smoothing
     current_atr = initial_atr
     for i in range(period + 1, len(tr_values)):
         # Wilder's smoothing: new_ATR = (old_ATR * (period - 1) + new_TR) / period
         current_atr = (current_atr * (period - 1) + tr_values[i]) / period
-        atr_values.append(current_atr)
+        atr_values[i] = current_atr
     
     return atr_values
 
@@ -232,12 +283,14 @@ def calculate_volume_ma(volumes: List[float], period: int = 20) -> List[Optional
     if len(volumes) < period:
         return [None] * len(volumes)
     
-    volume_ma = [None] * (period - 1)
+    volume_ma: List[Optional[float]] = [None] * len(volumes)
     
-    # Calculate SMA for each period
-    for i in range(period - 1, len(volumes)):
-        ma = sum(volumes[i - period + 1:i + 1]) / period
-        volume_ma.append(ma)
+    # Slide a running sum over the window instead of re-summing each one
+    window_sum = sum(volumes[:period])
+    volume_ma[period - 1] = window_sum / period
+    for i in range(period, len(volumes)):
+        window_sum += volumes[i] - volumes[i - period]
+        volume_ma[i] = window_sum / period
     
     return volume_ma
 
@@ -268,3 +321,213 @@ def calculate_ema_slope(ema_values: List[float], lookback: int = 4) -> Optional[
     
     return slope
 
+
+class StreamingEMA:
+    """
+    Incremental Exponential Moving Average with O(1) work per update.
+    
+    Produces the same values as calculate_ema: the first value is the SMA of
+    the first 'period' prices, later values use the standard recurrence.
+    """
+    
+    __slots__ = ("period", "multiplier", "value", "_seed_sum", "_seed_count")
+    
+    def __init__(self, period: int):
+        """
+        Initialize streaming EMA.
+        
+        Args:
+            period: EMA period (e.g., 9 or 20)
+        """
+        self.period = period
+        self.multiplier = 2.0 / (period + 1)
+        self.reset()
+    
+    def reset(self):
+        """Discard all seen prices, keeping the period and multiplier."""
+        self.value: Optional[float] = None
+        self._seed_sum = 0.0
+        self._seed_count = 0
+    
+    def update(self, price: float) -> Optional[float]:
+        """
+        Advance the EMA by one price.
+        
+        Args:
+            price: Next closing price
+        
+        Returns:
+            Current EMA value, or None while fewer than 'period' prices have been seen
+        """
+        if self.value is None:
+            self._seed_sum += price
+            self._seed_count += 1
+            if self._seed_count == self.period:
+                self.value = self._seed_sum / self.period
+            return self.value
+        
+        self.value = (price - self.value) * self.multiplier + self.value
+        return self.value
+    
+    def peek(self, price: float) -> Optional[float]:
+        """
+        Get the value update(price) would return, without advancing the EMA.
+        
+        Useful for a candle that is still forming and will change before it closes.
+        
+        Args:
+            price: Candidate next closing price
+        
+        Returns:
+            EMA value including the price, or None while warming up
+        """
+        if self.value is None:
+            if self._seed_count + 1 == self.period:
+                return (self._seed_sum + price) / self.period
+            return None
+        
+        return (price - self.value) * self.multiplier + self.value
+    
+    def to_state(self) -> Dict[str, float]:
+        """
+        Export the EMA state as plain values (e.g., for JSON persistence).
+        
+        Returns:
+            Dictionary that restore_state() accepts
+        """
+        return {
+            "period": self.period,
+            "value": self.value,
+            "seed_sum": self._seed_sum,
+            "seed_count": self._seed_count,
+        }
+    
+    def restore_state(self, state: Dict[str, float]):
+        """
+        Restore state exported by to_state().
+        
+        Args:
+            state: Dictionary from to_state()
+        """
+        if state["period"] != self.period:
+            raise ValueError(f"EMA period mismatch: expected {self.period}, got {state['period']}")
+        self.value = state["value"]
+        self._seed_sum = state["seed_sum"]
+        self._seed_count = state["seed_count"]
+
+
+class StreamingATR:
+    """
+    Incremental Average True Range using Wilder's smoothing.
+    
+    Produces the same values as calculate_atr, one bar at a time.
+    """
+    
+    __slots__ = ("period", "value", "_prev_close", "_seed_sum", "_count")
+    
+    def __init__(self, period: int = 14):
+        """
+        Initialize streaming ATR.
+        
+        Args:
+            period: ATR period (default: 14)
+        """
+        self.period = period
+        self.value: Optional[float] = None
+        self._prev_close: Optional[float] = None
+        self._seed_sum = 0.0
+        self._count = 0
+    
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        """
+        Advance the ATR by one bar.
+        
+        Args:
+            high: Bar high
+            low: Bar low
+            close: Bar close
+        
+        Returns:
+            Current ATR value, or None while warming up
+        """
+        if self._prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+        self._prev_close = close
+        self._count += 1
+        
+        if self._count <= self.period:
+            self._seed_sum += tr
+        elif self.value is None:
+            # calculate_atr places the initial SMA on bar 'period' without smoothing in its TR
+            self.value = self._seed_sum / self.period
+        else:
+            self.value = (self.value * (self.period - 1) + tr) / self.period
+        
+        return self.value
+
+
+class StreamingRSI:
+    """
+    Incremental Relative Strength Index using Wilder's smoothing.
+    
+    Produces the same values as calculate_rsi, one price at a time.
+    """
+    
+    __slots__ = ("period", "value", "_prev_price", "_avg_gain", "_avg_loss", "_count")
+    
+    def __init__(self, period: int = 14):
+        """
+        Initialize streaming RSI.
+        
+        Args:
+            period: RSI period (default: 14)
+        """
+        self.period = period
+        self.value: Optional[float] = None
+        self._prev_price: Optional[float] = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._count = 0
+    
+    def update(self, price: float) -> Optional[float]:
+        """
+        Advance the RSI by one price.
+        
+        Args:
+            price: Next closing price
+        
+        Returns:
+            Current RSI value, or None while fewer than period + 1 prices have been seen
+        """
+        if self._prev_price is None:
+            self._prev_price = price
+            return None
+        
+        delta = price - self._prev_price
+        self._prev_price = price
+        gain = delta if delta > 0 else 0
+        loss = -delta if delta < 0 else 0
+        self._count += 1
+        
+        if self._count < self.period:
+            # Until the first RSI, the averages hold running sums
+            self._avg_gain += gain
+            self._avg_loss += loss
+            return None
+        
+        if self._count == self.period:
+            self._avg_gain = (self._avg_gain + gain) / self.period
+            self._avg_loss = (self._avg_loss + loss) / self.period
+        else:
+            # Wilder's smoothing: new_avg = (old_avg * (period - 1) + new_value) / period
+            self._avg_gain = (self._avg_gain * (self.period - 1) + gain) / self.period
+            self._avg_loss = (self._avg_loss * (self.period - 1) + loss) / self.period
+        
+        if self._avg_loss == 0:
+            self.value = 100
+        else:
+            rs = self._avg_gain / self._avg_loss
+            self.value = 100 - (100 / (1 + rs))
+        return self.value
@@ -2,19 +2,51 @@
 Simple basic BTC trade test (no confirmation prompt).
 Opens a BTC long position immediately with improved TP/SL logic.
 """
-import time
-from trading_bot import TradingBot
+import logging
+import logging.handlers
+import sys
+from typing import Optional
+from trading_bot import TradingBot, extract_order_error, retry_with_backoff
 
+log = logging.getLogger(__name__)
 
-def test_basic_btc_trade_simple():
-    """Open a basic BTC long position with improved TP/SL logic."""
-    print("🚀 Basic BTC Trade Test")
-    print("=" * 60)
+# This script places a real order; keep pytest from collecting and running it
+__test__ = False
+
+# Banner line around report sections
+SEPARATOR = "=" * 60
+
+
+def test_basic_btc_trade_simple(bot: Optional[TradingBot] = None):
+    """
+    Open a basic BTC long position with improved TP/SL logic.
+    
+    Args:
+        bot: Existing TradingBot to reuse (and its open connections); a new
+            one is created if not given, and closed before returning
+    """
+    log.info("🚀 Basic BTC Trade Test")
+    log.info(SEPARATOR)
+    
+    if bot is not None:
+        return _run_btc_trade(bot)
     
+    # The bot's WebSocket threads would keep the script from exiting
     bot = TradingBot()
-    print(f"✅ Bot initialized")
-    print(f"Wallet: {bot.get_wallet_address()}")
-    print()
+    try:
+        return _run_btc_trade(bot)
+    finally:
+        bot.close()
+
+
+def _run_btc_trade(bot: TradingBot):
+    """Open the BTC position and set its TP/SL with the given bot."""
+    log.info("✅ Bot initialized")
+    log.info("Wallet: %s", bot.get_wallet_address())
+    
+    # Fetch the exchange meta and prices in one request, so the max
+    # leverage, size decimals and price lookups below are cache reads
+    bot.prefetch()
     
     # Configuration
     max_leverage = bot.get_max_leverage("BTC") or 40
@@ -22,145 +54,135 @@ def test_basic_btc_trade_simple():
     stop_loss_percent = 25.0  # 25% stop loss
     take_profit_percent = 75.0  # 75% take profit
     
-    print(f"📊 Configuration:")
-    print(f"   Symbol: BTC")
-    print(f"   Collateral: ${collateral_usd}")
-    print(f"   Leverage: {max_leverage}x")
-    print(f"   Stop Loss: {stop_loss_percent}%")
-    print(f"   Take Profit: {take_profit_percent}%")
-    print()
-    
-    # Get current price
-    current_price = bot.get_current_price("BTC")
-    if not current_price:
-        print("❌ Could not get current price")
+    log.info("📊 Configuration:")
+    log.info("   Symbol: BTC")
+    log.info("   Collateral: $%s", collateral_usd)
+    log.info("   Leverage: %sx", max_leverage)
+    log.info("   Stop Loss: %s%%", stop_loss_percent)
+    log.info("   Take Profit: %s%%", take_profit_percent)
+    
+    # Get current price, with the time it was received (it may be cached)
+    snapshot = bot.get_price_snapshot("BTC")
+    if not snapshot:
+        log.error("❌ Could not get current price")
         return None
+    current_price, priced_at = snapshot
     
-    print(f"💰 Current Price: ${current_price:,.2f}")
+    log.info("💰 Current Price: $%.2f", current_price)
     
-    # Calculate TP/SL prices for display
-    tp_price = current_price * (1 + take_profit_percent / 100)
-    sl_price = current_price * (1 - stop_loss_percent / 100)
-    print(f"   TP Target: ${tp_price:,.2f} (+{take_profit_percent}%)")
-    print(f"   SL Target: ${sl_price:,.2f} (-{stop_loss_percent}%)")
-    print()
+    # Calculate TP/SL prices once (rounded to the exchange's precision)
+    tp_price = bot.get_trigger_price("BTC", current_price, take_profit_percent, "tp", is_long=True)
+    sl_price = bot.get_trigger_price("BTC", current_price, stop_loss_percent, "sl", is_long=True)
+    log.info("   TP Target: $%.2f (+%s%%)", tp_price, take_profit_percent)
+    log.info("   SL Target: $%.2f (-%s%%)", sl_price, stop_loss_percent)
     
     # Set leverage
-    print(f"📊 Setting leverage to {max_leverage}x...")
+    log.info("📊 Setting leverage to %sx...", max_leverage)
     leverage_result = bot.set_leverage("BTC", max_leverage)
     if not leverage_result.get("success") and max_leverage > 25:
         # Try 25x if 40x fails
         leverage_result = bot.set_leverage("BTC", 25)
         if leverage_result.get("success"):
             max_leverage = 25
-            print(f"   ✅ Set leverage to {max_leverage}x")
+            log.info("   ✅ Set leverage to %sx", max_leverage)
     else:
-        print(f"   ✅ Leverage set to {max_leverage}x")
+        log.info("   ✅ Leverage set to %sx", max_leverage)
     
     # Calculate position size (will be rounded correctly)
-    position_size = bot.calculate_position_size("BTC", collateral_usd, max_leverage)
-    sz_decimals = bot.get_size_decimals("BTC")
-    print(f"💰 Position Size: {position_size:.{sz_decimals}f} BTC (rounded to {sz_decimals} decimals)")
-    print(f"   Position Value: ${collateral_usd * max_leverage:,.2f}")
-    print()
+    entry = bot.prepare_market_entry("BTC", collateral_usd, max_leverage, price=current_price, priced_at=priced_at)
+    position_size = entry.size
+    sz_decimals = entry.sz_decimals
+    log.info("💰 Position Size: %.*f BTC (rounded to %d decimals)", sz_decimals, position_size, sz_decimals)
+    log.info("   Position Value: $%.2f", collateral_usd * max_leverage)
     
     # Open position
-    print(f"📈 Opening BTC long position...")
+    log.info("📈 Opening BTC long position...")
     order_result = bot.create_market_order(
         symbol="BTC",
         side="B",  # Buy
-        amount=str(position_size),
+        amount=entry.amount,
+        entry=entry,
     )
     
     # Display result
     if not order_result.get("success"):
         error = order_result.get("error", "Unknown error")
-        print(f"\n❌ Trade failed: {error}")
+        log.error("❌ Trade failed: %s", error)
         return order_result
     
-    print(f"\n✅ Trade executed successfully!")
+    log.info("✅ Trade executed successfully!")
     order_id = order_result.get("order_id")
     if order_id:
-        print(f"   Order ID: {order_id}")
-    
-    # Wait for position to be confirmed
-    print(f"\n⏳ Waiting 2 seconds for position confirmation...")
-    time.sleep(2)
-    
-    # Get actual position size (may differ due to slippage)
-    actual_position_size = bot.get_position_size("BTC")
+        log.info("   Order ID: %s", order_id)
+    
+    # Get actual position size (may differ due to slippage). A filled market
+    # order reports it; otherwise wait for the position to be confirmed
+    actual_position_size = order_result.get("filled_size")
+    if actual_position_size is None:
+        log.info("⏳ Waiting for position confirmation...")
+        actual_position_size = bot.wait_for_position("BTC")
     if actual_position_size:
-        print(f"   ✅ Actual position size: {actual_position_size:.{sz_decimals}f} BTC")
+        log.info("   ✅ Actual position size: %.*f BTC", sz_decimals, actual_position_size)
         position_size_for_tpsl = actual_position_size
     else:
-        print(f"   ⚠️  Could not get actual position size, using calculated size")
+        log.warning("   ⚠️  Could not get actual position size, using calculated size")
         position_size_for_tpsl = position_size
     
-    # Set take profit (with retry)
-    print(f"\n🎯 Setting take profit at {take_profit_percent}%...")
-    tp_result = None
-    for attempt in range(3):
-        if attempt > 0:
-            print(f"   Retry {attempt}/2...")
-            time.sleep(1)
-        tp_result = bot.set_take_profit(
+    # Set take profit and stop loss with one signed request, then retry a
+    # rejected leg on its own
+    log.info("🎯 Setting take profit at %s%% and stop loss at %s%%...", take_profit_percent, stop_loss_percent)
+    tpsl_result = bot.set_tp_sl(
+        "BTC",
+        current_price,
+        position_size_for_tpsl,
+        take_profit_percent,
+        stop_loss_percent,
+        is_long=True,
+        tp_price=tp_price,
+        sl_price=sl_price,
+    )
+    tp_result = retry_with_backoff(
+        lambda: bot.set_take_profit(
             "BTC",
             current_price,
             position_size_for_tpsl,
             take_profit_percent,
-            is_long=True
-        )
-        if tp_result.get("success"):
-            break
-    
-    if not tp_result or not tp_result.get("success"):
-        error_msg = tp_result.get("error", "Unknown error") if tp_result else "No response"
-        response = tp_result.get("response", {}) if tp_result else {}
-        if isinstance(response, dict):
-            statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-            if statuses and "error" in statuses[0]:
-                error_msg = statuses[0]["error"]
-        print(f"   ❌ TP failed after retries: {error_msg}")
-        if response:
-            print(f"   Response: {response}")
-    else:
-        tp_price_actual = tp_result.get("tp_price", tp_price)
-        print(f"   ✅ TP set at ${tp_price_actual:,.2f} (+{take_profit_percent}%)")
-    
-    # Set stop loss (with retry)
-    print(f"\n🛡️  Setting stop loss at {stop_loss_percent}%...")
-    sl_result = None
-    for attempt in range(3):
-        if attempt > 0:
-            print(f"   Retry {attempt}/2...")
-            time.sleep(1)
-        sl_result = bot.set_stop_loss(
+            is_long=True,
+            price=tp_price,
+        ),
+        tpsl_result["take_profit"],
+        label="TP",
+    )
+    sl_result = retry_with_backoff(
+        lambda: bot.set_stop_loss(
             "BTC",
             current_price,
             position_size_for_tpsl,
             stop_loss_percent,
-            is_long=True
-        )
-        if sl_result.get("success"):
-            break
-    
-    if not sl_result or not sl_result.get("success"):
-        error_msg = sl_result.get("error", "Unknown error") if sl_result else "No response"
-        response = sl_result.get("response", {}) if sl_result else {}
-        if isinstance(response, dict):
-            statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-            if statuses and "error" in statuses[0]:
-                error_msg = statuses[0]["error"]
-        print(f"   ❌ SL failed after retries: {error_msg}")
-        if response:
-            print(f"   Response: {response}")
+            is_long=True,
+            price=sl_price,
+        ),
+        tpsl_result["stop_loss"],
+        label="SL",
+    )
+    
+    if not tp_result.get("success"):
+        log.error("   ❌ TP failed after retries: %s", extract_order_error(tp_result))
+        if tp_result.get("response"):
+            log.debug("   Response: %s", tp_result["response"])
+    else:
+        log.info("   ✅ TP set at $%.2f (+%s%%)", tp_price, take_profit_percent)
+    
+    if not sl_result.get("success"):
+        log.error("   ❌ SL failed after retries: %s", extract_order_error(sl_result))
+        if sl_result.get("response"):
+            log.debug("   Response: %s", sl_result["response"])
     else:
-        sl_price_actual = sl_result.get("sl_price", sl_price)
-        print(f"   ✅ SL set at ${sl_price_actual:,.2f} (-{stop_loss_percent}%)")
+        log.info("   ✅ SL set at $%.2f (-%s%%)", sl_price, stop_loss_percent)
     
-    print(f"\n{'='*60}")
-    print(f"✅ Test Complete!")
-    print(f"{'='*60}")
+    log.info(SEPARATOR)
+    log.info("✅ Test Complete!")
+    log.info(SEPARATOR)
     
     return {
         "order": order_result,
@@ -170,5 +192,18 @@ def test_basic_btc_trade_simple():
 
 
 if __name__ == "__main__":
-    test_basic_btc_trade_simple()
+    # Write the run's output in one go when it finishes (or as soon as an
+    # error is logged) instead of one write per line
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    buffer_handler = logging.handlers.MemoryHandler(
+        capacity=1000,
+        flushLevel=logging.ERROR,
+        target=stream_handler,
+    )
+    logging.basicConfig(level=logging.INFO, handlers=[buffer_handler])
+    try:
+        test_basic_btc_trade_simple()
+    finally:
+        buffer_handler.flush()
 
@@ -2,14 +2,308 @@
 Core trading bot class for Hyperliquid DEX.
 Handles wallet authentication and market order execution.
 """
-from typing import Optional, Dict, Any
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, Callable, List, NamedTuple, Tuple
 import eth_account
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from eth_account.signers.local import LocalAccount
 from hyperliquid.info import Info
 from hyperliquid.exchange import Exchange
 from hyperliquid.utils import constants
+from hyperliquid.utils.signing import OrderType, TriggerOrderType
 
-from config import API_URL, PRIVATE_KEY, USE_TESTNET
+from config import API_URL, DRY_RUN, PRIVATE_KEY, USE_TESTNET, USE_WEBSOCKET
+
+log = logging.getLogger(__name__)
+
+# Keep-alive connections per host, enough for one concurrent request per symbol
+HTTP_POOL_SIZE = 8
+
+# Retries for read-only /info requests on rate limiting (429, honouring
+# Retry-After) and transient gateway errors.
+# /exchange requests are not retried at the HTTP level, since resending an
+# action that may have been processed is not safe; only actions rejected with
+# 429 are retried, by _call_with_backoff (see RATE_LIMIT_RETRIES).
+INFO_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 502, 503, 504],
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+
+# Seconds before the cached exchange meta (size decimals, max leverage) is refetched
+META_TTL_SECONDS = 3600
+
+# Streamed or prefetched mid prices older than this (seconds) are not used;
+# the REST request is made instead, e.g. while the WebSocket is reconnecting
+WS_MIDS_MAX_AGE = 5.0
+
+# Seconds a REST allMids response serves price lookups before it is requested again
+MIDS_TTL_SECONDS = 2.0
+
+# Seconds the account state (margin, positions) serves reads before it is requested again
+USER_STATE_TTL_SECONDS = 1.0
+
+# Seconds after an order or leverage update during which webData2 pushes are
+# not cached; a push already in flight would still show the old account state
+WEB_DATA_SETTLE_SECONDS = 1.0
+
+# Order rejections that fail the same way on every retry (matched lowercase)
+NON_RETRYABLE_ORDER_ERRORS = ("insufficient margin", "invalid price", "minimum value")
+
+# Retries for /exchange requests rejected by the rate limiter (429). A
+# rate-limited action was not processed, so it is safe to send again. Delays
+# double from RATE_LIMIT_BASE_DELAY up to RATE_LIMIT_MAX_DELAY seconds.
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BASE_DELAY = 1.0
+RATE_LIMIT_MAX_DELAY = 30.0
+
+
+def _response_error(response: Any) -> Optional[str]:
+    """Get the error in a raw exchange response (first order status, or an "err" message)."""
+    if not isinstance(response, dict):
+        return None
+    body = response.get("response")
+    if isinstance(body, dict):
+        statuses = body.get("data", {}).get("statuses", [])
+        if statuses and "error" in statuses[0]:
+            return statuses[0]["error"]
+    elif response.get("status") == "err" and body:
+        return str(body)
+    return None
+
+
+def extract_order_error(result: Optional[Dict[str, Any]], default: str = "Unknown error") -> str:
+    """
+    Get the error message of a failed order result.
+    
+    Args:
+        result: Result dictionary from an order method (e.g., set_take_profit)
+        default: Message to return if the result records no error
+    
+    Returns:
+        The result's own "error" if set, otherwise the error in its exchange response
+    """
+    if not result:
+        return "No response"
+    return result.get("error") or _response_error(result.get("response")) or default
+
+
+def retry_with_backoff(
+    place_order: Callable[[], Dict[str, Any]],
+    result: Optional[Dict[str, Any]] = None,
+    retries: int = 2,
+    base_delay: float = 0.1,
+    label: str = "Order",
+) -> Dict[str, Any]:
+    """
+    Retry an order call with exponential backoff and jitter.
+    
+    Stops as soon as the order succeeds, or is rejected for a reason that
+    retrying can't fix (see NON_RETRYABLE_ORDER_ERRORS).
+    
+    Args:
+        place_order: Function that places the order and returns its response dictionary
+        result: Result of an attempt already made, if any (place_order is
+            only called again if it failed)
+        retries: Maximum number of retries
+        base_delay: Seconds before the first retry, doubled for each later one
+        label: Order name for retry messages (e.g., "TP")
+    
+    Returns:
+        Response dictionary of the last attempt
+    """
+    if result is None:
+        result = place_order()
+    
+    for attempt in range(retries):
+        if result.get("success"):
+            break
+        error = extract_order_error(result, default="").lower()
+        if any(marker in error for marker in NON_RETRYABLE_ORDER_ERRORS):
+            break
+        
+        log.info("   %s retry %d/%d...", label, attempt + 1, retries)
+        time.sleep(base_delay * 2 ** attempt + random.uniform(0, base_delay))
+        result = place_order()
+    
+    return result
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    """
+    Check whether an SDK exception is a rate-limit rejection (HTTP 429).
+    
+    Only the status code or explicit rate-limit wording counts: a bare "429"
+    in the message could be part of a price, oid or timestamp, and resending
+    an action that was actually processed could duplicate an order.
+    """
+    if getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error).lower()
+    return "rate limit" in message or "too many requests" in message
+
+
+def _call_with_backoff(call: Callable[[], Any], retries: int = RATE_LIMIT_RETRIES) -> Any:
+    """
+    Make an exchange call, backing off and retrying while it is rate limited.
+    
+    Any other exception is raised straight away, and so is a rate-limit
+    rejection once the retries are used up.
+    
+    Args:
+        call: Function making the exchange request
+        retries: Maximum number of retries
+    
+    Returns:
+        The call's return value
+    """
+    for attempt in range(retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if attempt >= retries or not _is_rate_limited(e):
+                raise
+            delay = min(RATE_LIMIT_MAX_DELAY, RATE_LIMIT_BASE_DELAY * 2 ** attempt)
+            delay += random.uniform(0, RATE_LIMIT_BASE_DELAY)
+            log.warning("⏳ Rate limited, retrying in %.1fs (%d/%d)", delay, attempt + 1, retries)
+            time.sleep(delay)
+
+
+def _trigger_order_type(trigger_price: float, tpsl: str) -> OrderType:
+    """
+    Build the order type of a market TP/SL trigger order.
+    
+    Args:
+        trigger_price: Price that triggers the order
+        tpsl: "tp" for take profit, "sl" for stop loss
+    
+    Returns:
+        OrderType for exchange.order() / bulk_orders()
+    """
+    # triggerPx should be a number (float), not a string
+    return OrderType(trigger=TriggerOrderType(triggerPx=float(trigger_price), isMarket=True, tpsl=tpsl))
+
+
+class AssetSpec(NamedTuple):
+    """Trading specs of one perp asset, parsed once per exchange meta refresh."""
+    
+    name: str
+    asset_id: int  # Position in the meta universe (the exchange's asset index)
+    sz_decimals: Optional[int]
+    max_leverage: Optional[int]
+
+
+def _format_size(size: float, sz_decimals: int) -> str:
+    """Format a size with sz_decimals places, without trailing zeros."""
+    size_str = f"{size:.{sz_decimals}f}"
+    if "." in size_str:
+        size_str = size_str.rstrip("0").rstrip(".")
+    return size_str
+
+
+class MarketEntry(NamedTuple):
+    """Everything a market entry needs, from prepare_market_entry()."""
+    
+    symbol: str
+    size: float  # Position size in base units, rounded to sz_decimals
+    amount: str  # size formatted for create_market_order()
+    price: float  # Mid price the size was calculated at
+    priced_at: float  # time.monotonic() when price was received
+    sz_decimals: int
+
+
+class _SingleFlight:
+    """
+    Share one in-flight call between threads that make the same request at once.
+    
+    The first caller for a key runs the call; callers arriving while it is
+    running wait for its result (or exception) instead of sending their own
+    request. Nothing is cached once the call returns.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, Future] = {}
+    
+    def do(self, key: Any, call: Callable[[], Any]) -> Any:
+        """
+        Run call(), or wait for the running call with the same key.
+        
+        Args:
+            key: Identifies the request (calls with equal keys are shared)
+            call: Function making the request
+        
+        Returns:
+            The call's return value
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        
+        if not leader:
+            return future.result()
+        
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class _DryRunExchange:
+    """
+    Stand-in for the SDK's Exchange that accepts every action without sending it.
+    
+    Responses have the shape of successful exchange responses, so the
+    TradingBot methods parse them as usual. Market orders fill in full;
+    trigger orders rest. Used when DRY_RUN is set.
+    """
+    
+    def __init__(self, info: Info):
+        self.info = info
+        self._oids = itertools.count(1)
+    
+    @staticmethod
+    def _ok(statuses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"status": "ok", "response": {"type": "order", "data": {"statuses": statuses}}}
+    
+    def market_open(self, name: str, is_buy: bool, sz: float, px: Optional[float] = None, slippage: float = 0.05) -> Dict[str, Any]:
+        log.info("🧪 DRY RUN: market %s %s %s", "buy" if is_buy else "sell", sz, name)
+        return self._ok([{"filled": {"oid": next(self._oids), "totalSz": str(sz)}}])
+    
+    def update_leverage(self, leverage: int, name: str, is_cross: bool = True) -> Dict[str, Any]:
+        log.info("🧪 DRY RUN: set %s leverage to %sx", name, leverage)
+        return {"status": "ok", "response": {"type": "default"}}
+    
+    def order(self, name: str, is_buy: bool, sz: float, limit_px: float, order_type: Any, reduce_only: bool = False) -> Dict[str, Any]:
+        log.info("🧪 DRY RUN: order %s %s %s at %s", "buy" if is_buy else "sell", sz, name, limit_px)
+        return self._ok([{"resting": {"oid": next(self._oids)}}])
+    
+    def bulk_orders(self, order_requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        for order in order_requests:
+            log.info(
+                "🧪 DRY RUN: order %s %s %s at %s",
+                "buy" if order["is_buy"] else "sell", order["sz"], order["coin"], order["limit_px"],
+            )
+        return self._ok([{"resting": {"oid": next(self._oids)}} for _ in order_requests])
 
 
 class TradingBot:
@@ -45,13 +339,60 @@ class TradingBot:
             api_url = constants.MAINNET_API_URL if not USE_TESTNET else constants.TESTNET_API_URL
             # Create LocalAccount from private key (eth_account format)
             self.account: LocalAccount = eth_account.Account.from_key(self.private_key_str)
-            self.info = Info(api_url, skip_ws=True)
+            self.info = Info(api_url, skip_ws=not USE_WEBSOCKET)
             # Create Exchange instance - this handles all signing and order placement
-            self.exchange = Exchange(self.account, api_url, account_address=None)
+            # (with DRY_RUN, actions are simulated and nothing is signed or sent)
+            if DRY_RUN:
+                self.exchange = _DryRunExchange(self.info)
+            else:
+                self.exchange = Exchange(self.account, api_url, account_address=None)
+            # Share one keep-alive connection pool between all API clients
+            # (Exchange keeps its own internal Info client)
+            self.session = requests.Session()
+            self.session.headers.update({"Content-Type": "application/json"})
+            self.session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+            self.session.mount(
+                f"{api_url}/info",
+                HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=INFO_RETRY),
+            )
+            for client in (self.info, self.exchange, self.exchange.info):
+                client.session = self.session
             # Get wallet address
             self.wallet_address = self.account.address
         except Exception as e:
             raise ValueError(f"Failed to initialize Hyperliquid wallet: {e}")
+        if DRY_RUN:
+            log.warning("🧪 DRY RUN: orders and leverage updates are simulated, not sent")
+        
+        # Asset metadata (size decimals, max leverage) is fetched on first use
+        # and refreshed every META_TTL_SECONDS
+        self._meta: Any = None
+        self._meta_time = 0.0
+        self._asset_specs: Dict[str, AssetSpec] = {}
+        # Held while refreshing, so threads that find it expired fetch it once
+        self._meta_lock = threading.Lock()
+        
+        # Concurrent identical /info requests (e.g. every symbol's price at
+        # the same candle close) share one round-trip
+        self._single_flight = _SingleFlight()
+        
+        # Last account state as (monotonic receive time, user_state); cleared
+        # after actions that change margin or positions
+        self._user_state: Optional[Tuple[float, Dict[str, Any]]] = None
+        # Monotonic time the account state was last cleared
+        self._user_state_cleared_at = float("-inf")
+        
+        # Last leverage set successfully per symbol, as (leverage, is_cross)
+        self._leverage_state: Dict[str, Tuple[int, bool]] = {}
+        
+        # Latest mid prices as (monotonic receive time, mids), from the allMids
+        # stream (if enabled) or prefetch()
+        self._mids: Optional[Tuple[float, Dict[str, str]]] = None
+        # Last REST allMids response as (monotonic receive time, mids)
+        self._rest_mids: Optional[Tuple[float, Dict[str, str]]] = None
+        if USE_WEBSOCKET:
+            self.info.subscribe({"type": "allMids"}, self._on_all_mids)
+            self.info.subscribe({"type": "webData2", "user": self.wallet_address}, self._on_web_data)
     
     def create_market_order(
         self,
@@ -60,6 +401,7 @@ class TradingBot:
         amount: str,
         slippage: Optional[float] = None,
         reduce_only: bool = False,
+        entry: Optional[MarketEntry] = None,
     ) -> Dict[str, Any]:
         """
         Create a market order on Hyperliquid.
@@ -70,10 +412,21 @@ class TradingBot:
             amount: Order amount as string (in base units, e.g., "0.1" for BTC)
             slippage: Slippage tolerance (default: 0.05 = 5%). None uses default.
             reduce_only: Whether this is a reduce-only order (Note: market_open doesn't support this directly)
+            entry: Entry from prepare_market_entry(), if any; while its price is
+                at most WS_MIDS_MAX_AGE seconds old it is the reference for the
+                slippage limit, so the SDK doesn't request the mids again
         
         Returns:
-            Response dictionary with status and order details
+            Response dictionary with status and order details. On success,
+            "filled_size" is the size filled immediately, or None if the
+            order didn't fill (e.g. it is resting)
         """
+        # An older price (e.g. read before a slow leverage update) would anchor
+        # the slippage band away from the market; let the SDK read the mids
+        reference_price = None
+        if entry is not None and time.monotonic() - entry.priced_at <= WS_MIDS_MAX_AGE:
+            reference_price = entry.price
+        
         try:
             # Convert side to boolean (B = buy = True, A = sell = False)
             is_buy = side.upper() == "B" or side.lower() == "buy" or side.lower() == "bid"
@@ -83,28 +436,39 @@ class TradingBot:
             
             # Use Exchange.market_open() method - this handles all signing and formatting
             # Signature: market_open(name, is_buy, sz, px=None, slippage=0.05, cloid=None, builder=None)
-            # For market orders, px should be None
+            # px is only the reference price for the slippage limit; if None,
+            # the SDK requests the current mids itself
             # slippage defaults to 0.05 (5%) if not provided
-            response = self.exchange.market_open(
-                symbol,  # name (positional)
-                is_buy,  # is_buy (positional)
-                size,  # sz (positional)
-                None,  # px (None for market order)
-                slippage if slippage is not None else 0.05,  # slippage (default 0.05)
-            )
+            try:
+                response = _call_with_backoff(lambda: self.exchange.market_open(
+                    symbol,  # name (positional)
+                    is_buy,  # is_buy (positional)
+                    size,  # sz (positional)
+                    reference_price,  # px (None: the SDK uses the current mid)
+                    slippage if slippage is not None else 0.05,  # slippage (default 0.05)
+                ))
+            finally:
+                # Margin and positions may have changed, even if the call raised
+                self._clear_user_state()
             
             # Note: reduce_only is not directly supported by market_open
             # To implement reduce_only, you would need to use exchange.order() with specific parameters
             
-            # Parse response
-            if response.get("status") == "ok":
-                # Extract order ID from response
+            # Parse response; an order the exchange rejected (e.g. an IOC that
+            # couldn't match) comes back as an "error" inside an "ok" response
+            error_msg = _response_error(response)
+            if response.get("status") == "ok" and error_msg is None:
+                # Extract order ID (and filled size) from response
                 order_id = None
+                filled_size = None
                 statuses = response.get("response", {}).get("data", {}).get("statuses", [])
                 if statuses:
                     # Check for filled order first
                     if "filled" in statuses[0]:
                         order_id = statuses[0]["filled"].get("oid")
+                        total_size = statuses[0]["filled"].get("totalSz")
+                        if total_size is not None:
+                            filled_size = float(total_size)
                     # Otherwise check for resting order
                     elif "resting" in statuses[0]:
                         order_id = statuses[0]["resting"].get("oid")
@@ -114,19 +478,14 @@ class TradingBot:
                     "status_code": 200,
                     "response": response,
                     "order_id": order_id,
+                    "filled_size": filled_size,
                 }
             else:
-                # Extract error message
-                error_msg = "Unknown error"
-                statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-                if statuses and "error" in statuses[0]:
-                    error_msg = statuses[0]["error"]
-                
                 return {
                     "success": False,
                     "status_code": 400,
                     "response": response,
-                    "error": error_msg,
+                    "error": error_msg or "Unknown error",
                 }
         except Exception as e:
             return {
@@ -151,108 +510,429 @@ class TradingBot:
             Maximum leverage as integer, or None if not found
         """
         try:
-            meta = self.info.meta()
-            
-            # Find asset in meta
-            asset_info = None
-            if isinstance(meta, dict) and "universe" in meta:
-                for asset in meta["universe"]:
-                    if asset.get("name") == symbol:
-                        asset_info = asset
-                        break
-            elif isinstance(meta, list):
-                for asset in meta:
-                    if isinstance(asset, dict) and asset.get("name") == symbol:
-                        asset_info = asset
-                        break
-            
-            if asset_info:
-                # Try different possible field names
-                max_leverage = (
-                    asset_info.get("maxLeverage") or
-                    asset_info.get("max_leverage") or
-                    asset_info.get("leverage") or
-                    asset_info.get("maxLeverage")
-                )
-                
-                if max_leverage:
-                    return int(max_leverage)
-            
+            spec = self._get_asset_spec(symbol)
+            return spec.max_leverage if spec else None
+        except Exception as e:
+            log.error("Error getting max leverage for %s: %s", symbol, e)
             return None
+    
+    def get_max_leverages(self, symbols: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Get the maximum leverage for several symbols with at most one meta request.
+        
+        Args:
+            symbols: Trading symbols (e.g., ["BTC", "ETH"])
+        
+        Returns:
+            Dictionary mapping symbol to maximum leverage, or None if not found
+        """
+        try:
+            self._get_meta()
         except Exception as e:
-            print(f"Error getting max leverage for {symbol}: {e}")
+            log.error("Error getting max leverage for %s: %s", ', '.join(symbols), e)
+            return {symbol: None for symbol in symbols}
+        
+        leverages = {}
+        for symbol in symbols:
+            spec = self._asset_specs.get(symbol)
+            leverages[symbol] = spec.max_leverage if spec else None
+        return leverages
+    
+    def _get_meta(self) -> Any:
+        """
+        Get the exchange meta, fetching it at most once per META_TTL_SECONDS.
+        
+        Asset specs (size decimals, max leverage) rarely change, so one meta
+        request serves every lookup until the cache expires. If refreshing
+        fails, the expired meta keeps being used.
+        
+        Thread-safe: if several threads find the cache expired at once, one
+        of them refreshes it and the others wait and reuse the result.
+        
+        Returns:
+            Response from info.meta()
+        """
+        if self._meta is not None and time.monotonic() - self._meta_time <= META_TTL_SECONDS:
+            return self._meta
+        
+        with self._meta_lock:
+            # Another thread may have refreshed it while this one waited
+            if self._meta is None or time.monotonic() - self._meta_time > META_TTL_SECONDS:
+                try:
+                    meta = self.info.meta()
+                except Exception as e:
+                    if self._meta is None:
+                        raise
+                    log.warning("⚠️  Could not refresh exchange meta, using cached copy: %s", e)
+                    self._meta_time = time.monotonic()
+                    return self._meta
+                
+                self._store_meta(meta)
+        return self._meta
+    
+    def _store_meta(self, meta: Any):
+        """
+        Cache the exchange meta and parse an AssetSpec for each of its assets.
+        
+        Args:
+            meta: Response from info.meta() (or the meta half of metaAndAssetCtxs)
+        """
+        assets = []
+        if isinstance(meta, dict) and "universe" in meta:
+            assets = meta["universe"]
+        elif isinstance(meta, list):
+            assets = meta
+        
+        # Index specs by name; the first entry wins, as in a linear scan
+        specs = {}
+        for asset_id, asset in enumerate(assets):
+            if not isinstance(asset, dict) or asset.get("name") is None or asset["name"] in specs:
+                continue
+            try:
+                sz_decimals = asset.get("szDecimals")
+                specs[asset["name"]] = AssetSpec(
+                    name=asset["name"],
+                    asset_id=asset_id,
+                    sz_decimals=int(sz_decimals) if sz_decimals is not None else None,
+                    max_leverage=self._max_leverage_from_asset(asset),
+                )
+            except (TypeError, ValueError) as e:
+                log.warning("⚠️  Skipping malformed meta entry for %s: %s", asset["name"], e)
+        
+        self._asset_specs = specs
+        self._meta = meta
+        self._meta_time = time.monotonic()
+    
+    def prefetch(self) -> bool:
+        """
+        Fetch the exchange meta and all mid prices with one request.
+        
+        The metaAndAssetCtxs response holds the asset specs (size decimals,
+        max leverage) and each asset's current prices. Calling this before a
+        trade turns the following get_max_leverage(), get_size_decimals() and
+        get_current_price() calls into cache reads, as long as the prices are
+        used within WS_MIDS_MAX_AGE seconds.
+        
+        Returns:
+            True if the caches were filled, False if the request failed (the
+            getters then make their own requests as usual)
+        """
+        try:
+            meta, asset_ctxs = self.info.meta_and_asset_ctxs()
+        except Exception as e:
+            log.warning("⚠️  Could not prefetch exchange meta and prices: %s", e)
+            return False
+        
+        self._store_meta(meta)
+        
+        # Asset contexts are listed in universe order
+        mids = {}
+        for asset, ctx in zip(meta.get("universe", []), asset_ctxs):
+            price_str = ctx.get("midPx") or ctx.get("markPx")
+            if price_str:
+                mids[asset["name"]] = price_str
+        self._mids = (time.monotonic(), mids)
+        return True
+    
+    def _get_asset_spec(self, symbol: str) -> Optional[AssetSpec]:
+        """
+        Look up a symbol's specs in the exchange meta.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+        
+        Returns:
+            The asset's AssetSpec, or None if the symbol is not listed
+        """
+        self._get_meta()
+        return self._asset_specs.get(symbol)
+    
+    def _max_leverage_from_asset(self, asset_info: Optional[Dict[str, Any]]) -> Optional[int]:
+        """
+        Read the maximum leverage from an asset's meta entry.
+        
+        Only called while parsing the meta (see _store_meta); lookups read
+        the result from the asset's AssetSpec.
+        
+        Args:
+            asset_info: Asset entry from the meta universe, or None
+        
+        Returns:
+            Maximum leverage as integer, or None if not found
+        """
+        if not asset_info:
             return None
+        
+        # Try different possible field names
+        max_leverage = (
+            asset_info.get("maxLeverage") or
+            asset_info.get("max_leverage") or
+            asset_info.get("leverage")
+        )
+        return int(max_leverage) if max_leverage else None
     
     def get_current_price(self, symbol: str) -> Optional[float]:
         """
         Get the current mid price for a symbol.
         
+        See _get_mids() for where the price comes from.
+        
         Args:
             symbol: Trading symbol (e.g., "BTC")
         
         Returns:
             Current mid price as float, or None if not found
         """
+        snapshot = self.get_price_snapshot(symbol)
+        return snapshot[0] if snapshot else None
+    
+    def get_price_snapshot(self, symbol: str) -> Optional[Tuple[float, float]]:
+        """
+        Get the current mid price for a symbol, with the time it was received.
+        
+        The price may come from a cached snapshot (see _get_mids()), so its
+        age is that of the snapshot, not of this call.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+        
+        Returns:
+            (mid price, time.monotonic() when its snapshot was received), or
+            None if not found
+        """
         try:
-            mids = self.info.all_mids()
+            received_at, mids = self._get_mids(symbol)
             price_str = mids.get(symbol)
             if price_str:
-                return float(price_str)
+                return float(price_str), received_at
             return None
         except Exception as e:
-            print(f"Error getting price for {symbol}: {e}")
+            log.error("Error getting price for %s: %s", symbol, e)
             return None
     
-    def get_position_size(self, symbol: str) -> Optional[float]:
+    def get_current_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
         """
-        Get the current position size for a symbol.
+        Get the current mid prices for several symbols from one mids snapshot.
         
         Args:
-            symbol: Trading symbol (e.g., "BTC")
+            symbols: Trading symbols (e.g., ["BTC", "ETH"])
         
         Returns:
-            Position size in base units, or None if no position
+            Dictionary mapping symbol to mid price, or None if not found
         """
         try:
-            user_state = self.info.user_state(self.wallet_address)
-            positions = user_state.get("assetPositions", [])
-            
-            for pos in positions:
-                position_data = pos.get("position", {})
-                if position_data.get("coin") == symbol:
-                    size = float(position_data.get("szi", 0))
-                    if size != 0:
-                        return abs(size)  # Return absolute value
+            _, mids = self._get_mids(*symbols)
+        except Exception as e:
+            log.error("Error getting prices for %s: %s", ', '.join(symbols), e)
+            return {symbol: None for symbol in symbols}
+        
+        prices = {}
+        for symbol in symbols:
+            price_str = mids.get(symbol)
+            prices[symbol] = float(price_str) if price_str else None
+        return prices
+    
+    def _get_mids(self, *symbols: str) -> Tuple[float, Dict[str, str]]:
+        """
+        Get a snapshot of all mid prices, requesting one only when needed.
+        
+        In order of preference: the streamed (USE_WEBSOCKET) or prefetched
+        mids while at most WS_MIDS_MAX_AGE seconds old, then the last REST
+        response while at most MIDS_TTL_SECONDS old, then a new allMids
+        request. A cached snapshot missing any of the symbols is skipped.
+        
+        Args:
+            symbols: Symbols the snapshot must contain
+        
+        Returns:
+            (time.monotonic() when the snapshot was received, dictionary
+            mapping symbol to mid price string)
+        """
+        now = time.monotonic()
+        for cached, max_age in ((self._mids, WS_MIDS_MAX_AGE), (self._rest_mids, MIDS_TTL_SECONDS)):
+            if cached is not None and now - cached[0] <= max_age:
+                if all(symbol in cached[1] for symbol in symbols):
+                    return cached
+        
+        # allMids covers every symbol, so concurrent lookups share one request
+        mids = self._single_flight.do("allMids", self.info.all_mids)
+        self._rest_mids = (time.monotonic(), mids)
+        return self._rest_mids
+    
+    def _on_all_mids(self, message: Dict[str, Any]):
+        """Store mid prices pushed by the allMids WebSocket subscription."""
+        mids = message.get("data", {}).get("mids")
+        if mids:
+            # Replaced as one tuple, so readers never see a time without its mids
+            self._mids = (time.monotonic(), mids)
+    
+    def _on_web_data(self, message: Dict[str, Any]):
+        """Store the account state pushed by the webData2 WebSocket subscription."""
+        user_state = message.get("data", {}).get("clearinghouseState")
+        now = time.monotonic()
+        if user_state and now - self._user_state_cleared_at > WEB_DATA_SETTLE_SECONDS:
+            # Serves reads like a REST response, for USER_STATE_TTL_SECONDS
+            self._user_state = (now, user_state)
+    
+    def _clear_user_state(self):
+        """Drop the cached account state after an action that changes it."""
+        self._user_state = None
+        self._user_state_cleared_at = time.monotonic()
+    
+    def close(self):
+        """Close the WebSocket connection, if one was opened (USE_WEBSOCKET)."""
+        if USE_WEBSOCKET:
+            self.info.disconnect_websocket()
+    
+    def _get_user_state(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """
+        Get the account's clearinghouse state (margin and positions).
+        
+        A response is reused for USER_STATE_TTL_SECONDS, and concurrent
+        callers (e.g. a margin check and a position check running side by
+        side) share one request. Market orders and leverage updates clear it.
+        With USE_WEBSOCKET, states pushed over webData2 keep the cache fresh,
+        so reads only fall back to REST while the stream is quiet (pushes
+        are ignored for WEB_DATA_SETTLE_SECONDS after the cache is cleared).
+        
+        Args:
+            force_refresh: Request it even if the cached state is still fresh
+        
+        Returns:
+            Response from info.user_state()
+        """
+        cached = self._user_state
+        if not force_refresh and cached is not None and time.monotonic() - cached[0] <= USER_STATE_TTL_SECONDS:
+            return cached[1]
+        
+        requested_at = time.monotonic()
+        user_state = self._single_flight.do(
+            ("userState", self.wallet_address),
+            lambda: self.info.user_state(self.wallet_address),
+        )
+        # A request that was sent before the state was cleared may predate the
+        # action, so it is returned but not cached
+        if requested_at >= self._user_state_cleared_at:
+            self._user_state = (time.monotonic(), user_state)
+        return user_state
+    
+    def get_withdrawable(self) -> Optional[float]:
+        """
+        Get the account's free margin (USD that could be withdrawn right now).
+        
+        Returns:
+            Withdrawable amount in USD, or None if it could not be read
+        """
+        try:
+            user_state = self._get_user_state()
+            return float(user_state["withdrawable"])
+        except Exception as e:
+            log.error("Error getting withdrawable margin: %s", e)
             return None
+    
+    def get_all_position_sizes(self, force_refresh: bool = False) -> Optional[Dict[str, float]]:
+        """
+        Get the size of every open position from one account state.
+        
+        Args:
+            force_refresh: Skip the cached account state
+        
+        Returns:
+            Dictionary mapping symbol to position size in base units (absolute
+            value, open positions only), or None if it could not be read
+        """
+        try:
+            user_state = self._get_user_state(force_refresh)
+            sizes = {}
+            for pos in user_state.get("assetPositions", []):
+                position_data = pos.get("position", {})
+                size = float(position_data.get("szi", 0))
+                if size != 0:
+                    sizes.setdefault(position_data.get("coin"), abs(size))
+            return sizes
         except Exception as e:
-            print(f"Error getting position size for {symbol}: {e}")
+            log.error("Error getting positions: %s", e)
+            return None
+    
+    def get_position_size(self, symbol: str, force_refresh: bool = False) -> Optional[float]:
+        """
+        Get the current position size for a symbol.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            force_refresh: Skip the cached account state
+        
+        Returns:
+            Position size in base units, or None if no position
+        """
+        sizes = self.get_all_position_sizes(force_refresh)
+        if sizes is None:
             return None
+        return sizes.get(symbol)
+    
+    def wait_for_position(self, symbol: str, timeout: float = 2.0, poll_interval: float = 0.25) -> Optional[float]:
+        """
+        Wait for a position in a symbol to show up and get its size.
+        
+        Polls get_position_size (bypassing the cached account state) until it
+        returns a position, so a fill that is visible right away doesn't wait
+        for the whole timeout.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            timeout: Maximum seconds to wait
+            poll_interval: Seconds between checks
+        
+        Returns:
+            Position size in base units, or None if no position appeared in time
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            size = self.get_position_size(symbol, force_refresh=True)
+            remaining = deadline - time.monotonic()
+            if size or remaining <= 0:
+                return size
+            time.sleep(min(poll_interval, remaining))
     
     def set_leverage(self, symbol: str, leverage: int, is_cross: bool = True) -> Dict[str, Any]:
         """
         Set leverage for a symbol.
         
+        The exchange request is skipped if this bot already set the same
+        leverage and margin mode for the symbol. Leverage changed outside the
+        bot (e.g. in the web UI) is not noticed until the bot sets another value.
+        
         Args:
             symbol: Trading symbol (e.g., "BTC")
             leverage: Leverage multiplier (e.g., 10 for 10x)
             is_cross: True for cross margin, False for isolated margin
         
         Returns:
-            Response dictionary
+            Response dictionary ("cached" is True if no request was made)
         """
+        if self._leverage_state.get(symbol) == (leverage, is_cross):
+            return {"success": True, "cached": True}
+        
         try:
-            response = self.exchange.update_leverage(leverage, symbol, is_cross)
+            try:
+                response = _call_with_backoff(lambda: self.exchange.update_leverage(leverage, symbol, is_cross))
+            finally:
+                # Margin in use may have changed, even if the call raised
+                self._clear_user_state()
             if isinstance(response, dict):
-                return {
-                    "success": response.get("status") == "ok",
-                    "response": response,
-                }
+                success = response.get("status") == "ok"
             else:
                 # Some exchanges return string or other format
-                return {
-                    "success": True,
-                    "response": response,
-                }
+                success = True
+            
+            if success:
+                self._leverage_state[symbol] = (leverage, is_cross)
+            else:
+                self._leverage_state.pop(symbol, None)
+            return {
+                "success": success,
+                "response": response,
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -270,33 +950,40 @@ class TradingBot:
             Number of decimal places
         """
         try:
-            meta = self.info.meta()
-            
-            # Find asset in meta
-            asset_info = None
-            if isinstance(meta, dict) and "universe" in meta:
-                for asset in meta["universe"]:
-                    if asset.get("name") == symbol:
-                        asset_info = asset
-                        break
-            elif isinstance(meta, list):
-                for asset in meta:
-                    if isinstance(asset, dict) and asset.get("name") == symbol:
-                        asset_info = asset
-                        break
-            
-            if asset_info:
-                sz_decimals = asset_info.get("szDecimals")
-                if sz_decimals is not None:
-                    return int(sz_decimals)
+            spec = self._get_asset_spec(symbol)
+            if spec and spec.sz_decimals is not None:
+                return spec.sz_decimals
             
             # Default to 5 decimals if not found
             return 5
         except Exception as e:
-            print(f"Error getting size decimals for {symbol}: {e}")
+            log.error("Error getting size decimals for %s: %s", symbol, e)
             return 5
     
-    def calculate_position_size(self, symbol: str, collateral_usd: float, leverage: int) -> float:
+    def format_size(self, symbol: str, size: float) -> str:
+        """
+        Format an order size as a plain decimal string at the asset's precision.
+        
+        Unlike str(), this never uses scientific notation (e.g. "1e-05") or
+        shows float noise beyond the size decimals.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            size: Size in base units
+        
+        Returns:
+            Size string without trailing zeros (e.g., "0.00012")
+        """
+        return _format_size(size, self.get_size_decimals(symbol))
+    
+    def calculate_position_size(
+        self,
+        symbol: str,
+        collateral_usd: float,
+        leverage: int,
+        *,
+        price: Optional[float] = None,
+    ) -> float:
         """
         Calculate position size in base units from USD collateral and leverage.
         Rounds to the correct number of decimals for the asset.
@@ -305,11 +992,12 @@ class TradingBot:
             symbol: Trading symbol (e.g., "BTC")
             collateral_usd: Collateral amount in USD
             leverage: Leverage multiplier
+            price: Price to size the position at; fetched if not given
         
         Returns:
             Position size in base units (e.g., BTC amount), rounded correctly
         """
-        current_price = self.get_current_price(symbol)
+        current_price = price if price is not None else self.get_current_price(symbol)
         if current_price is None:
             raise ValueError(f"Could not get current price for {symbol}")
         
@@ -325,13 +1013,114 @@ class TradingBot:
         
         return position_size
     
+    def prepare_market_entry(
+        self,
+        symbol: str,
+        collateral_usd: float,
+        leverage: int,
+        price: Optional[float] = None,
+        priced_at: Optional[float] = None,
+    ) -> MarketEntry:
+        """
+        Size a market entry and gather the specs placing it needs.
+        
+        Looks up the asset's specs once (from the meta cache when it is
+        fresh), so sizing, logging and create_market_order(entry=...) all use
+        the same values.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            collateral_usd: Collateral amount in USD
+            leverage: Leverage multiplier
+            price: Price to size the position at; fetched if not given
+            priced_at: time.monotonic() when the given price was received, as
+                returned by get_price_snapshot() (defaults to now)
+        
+        Returns:
+            MarketEntry for the position
+        
+        Raises:
+            ValueError: If no price is available for the symbol
+        """
+        if price is None:
+            snapshot = self.get_price_snapshot(symbol)
+            if snapshot is None:
+                raise ValueError(f"Could not get current price for {symbol}")
+            price, priced_at = snapshot
+        if priced_at is None:
+            priced_at = time.monotonic()
+        
+        try:
+            spec = self._get_asset_spec(symbol)
+        except Exception as e:
+            log.error("Error getting size decimals for %s: %s", symbol, e)
+            spec = None
+        # Default to 5 decimals if not found, as get_size_decimals() does
+        sz_decimals = spec.sz_decimals if spec and spec.sz_decimals is not None else 5
+        
+        # Position size in base units = collateral * leverage / price
+        size = round(collateral_usd * leverage / price, sz_decimals)
+        return MarketEntry(
+            symbol=symbol,
+            size=size,
+            amount=_format_size(size, sz_decimals),
+            price=price,
+            priced_at=priced_at,
+            sz_decimals=sz_decimals,
+        )
+    
+    def round_price(self, symbol: str, price: float) -> float:
+        """
+        Round a price to what the exchange accepts for a perp.
+        
+        Hyperliquid allows at most 5 significant figures and at most
+        6 - szDecimals decimal places.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            price: Raw price
+        
+        Returns:
+            Rounded price
+        """
+        return round(float(f"{price:.5g}"), 6 - self.get_size_decimals(symbol))
+    
+    def get_trigger_price(
+        self,
+        symbol: str,
+        entry_price: float,
+        percent: float,
+        tpsl: str,
+        is_long: bool = True,
+    ) -> float:
+        """
+        Calculate a rounded take-profit or stop-loss trigger price.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            entry_price: Entry price of the position
+            percent: Distance from the entry price in percent (e.g., 5.0 for 5%)
+            tpsl: "tp" for take profit, "sl" for stop loss
+            is_long: True for long position, False for short
+        
+        Returns:
+            Trigger price, rounded with round_price
+        """
+        # For long: TP is above entry price and SL below; the reverse for short
+        if is_long == (tpsl == "tp"):
+            price = entry_price * (1 + percent / 100)
+        else:
+            price = entry_price * (1 - percent / 100)
+        return self.round_price(symbol, price)
+    
     def set_take_profit(
         self,
         symbol: str,
         entry_price: float,
         position_size: float,
         tp_percent: float,
-        is_long: bool = True
+        is_long: bool = True,
+        price: Optional[float] = None,
     ) -> Dict[str, Any]:
         """
         Set a take-profit order.
@@ -342,61 +1131,49 @@ class TradingBot:
             position_size: Position size in base units
             tp_percent: Take profit percentage (e.g., 5.0 for 5%)
             is_long: True for long position, False for short
+            price: Precomputed TP price (from get_trigger_price); if given,
+                entry_price and tp_percent are not used
         
         Returns:
             Response dictionary
         """
         try:
-            from hyperliquid.utils.signing import OrderType, TriggerOrderType
-            
-            # Calculate TP price based on position direction
-            if is_long:
-                # For long: TP is above entry price
-                tp_price = entry_price * (1 + tp_percent / 100)
-                is_buy = False  # Sell to close long
-            else:
-                # For short: TP is below entry price
-                tp_price = entry_price * (1 - tp_percent / 100)
-                is_buy = True  # Buy to close short
+            # TP price based on position direction, unless already computed
+            tp_price = price if price is not None else self.get_trigger_price(symbol, entry_price, tp_percent, "tp", is_long)
+            is_buy = not is_long  # Sell to close long, buy to close short
             
             # Create trigger order for take profit
-            # triggerPx should be a number (float), not a string
-            trigger_order_type = OrderType(
-                trigger=TriggerOrderType(
-                    triggerPx=float(tp_price),
-                    isMarket=True,
-                    tpsl="tp"
-                )
-            )
+            trigger_order_type = _trigger_order_type(tp_price, "tp")
             
             # Ensure position_size is a float
             position_size_float = float(position_size)
             
             # Place reduce-only order at TP price
             # For trigger orders, pass the trigger price as limit_px (even for market orders)
-            response = self.exchange.order(
+            response = _call_with_backoff(lambda: self.exchange.order(
                 symbol,
                 is_buy,
                 position_size_float,
                 tp_price,  # limit_px - trigger price
                 trigger_order_type,
                 reduce_only=True
-            )
+            ))
             
-            # Check response status
-            success = response.get("status") == "ok"
-            if not success:
-                # Log error details
-                statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-                if statuses and "error" in statuses[0]:
-                    error_msg = statuses[0]["error"]
-                    print(f"   ⚠️  TP order error: {error_msg}")
-            
-            return {
+            # Check response status; the exchange also rejects single orders
+            # inside an "ok" response, as an "error" in their status
+            error_msg = _response_error(response)
+            success = response.get("status") == "ok" and error_msg is None
+            result = {
                 "success": success,
                 "response": response,
                 "tp_price": tp_price,
             }
+            if not success:
+                # Log error details
+                result["error"] = error_msg or "Unknown error"
+                log.warning("   ⚠️  TP order error: %s", result["error"])
+            
+            return result
         except Exception as e:
             return {
                 "success": False,
@@ -409,7 +1186,8 @@ class TradingBot:
         entry_price: float,
         position_size: float,
         sl_percent: float,
-        is_long: bool = True
+        is_long: bool = True,
+        price: Optional[float] = None,
     ) -> Dict[str, Any]:
         """
         Set a stop-loss order.
@@ -420,63 +1198,124 @@ class TradingBot:
             position_size: Position size in base units
             sl_percent: Stop loss percentage (e.g., 2.0 for 2%)
             is_long: True for long position, False for short
+            price: Precomputed SL price (from get_trigger_price); if given,
+                entry_price and sl_percent are not used
         
         Returns:
             Response dictionary
         """
         try:
-            from hyperliquid.utils.signing import OrderType, TriggerOrderType
-            
-            # Calculate SL price based on position direction
-            if is_long:
-                # For long: SL is below entry price
-                sl_price = entry_price * (1 - sl_percent / 100)
-                is_buy = False  # Sell to close long
-            else:
-                # For short: SL is above entry price
-                sl_price = entry_price * (1 + sl_percent / 100)
-                is_buy = True  # Buy to close short
+            # SL price based on position direction, unless already computed
+            sl_price = price if price is not None else self.get_trigger_price(symbol, entry_price, sl_percent, "sl", is_long)
+            is_buy = not is_long  # Sell to close long, buy to close short
             
             # Create trigger order for stop loss
-            # triggerPx should be a number (float), not a string
-            trigger_order_type = OrderType(
-                trigger=TriggerOrderType(
-                    triggerPx=float(sl_price),
-                    isMarket=True,
-                    tpsl="sl"
-                )
-            )
+            trigger_order_type = _trigger_order_type(sl_price, "sl")
             
             # Ensure position_size is a float
             position_size_float = float(position_size)
             
             # Place reduce-only order at SL price
             # For trigger orders, pass the trigger price as limit_px (even for market orders)
-            response = self.exchange.order(
+            response = _call_with_backoff(lambda: self.exchange.order(
                 symbol,
                 is_buy,
                 position_size_float,
                 sl_price,  # limit_px - trigger price
                 trigger_order_type,
                 reduce_only=True
-            )
-            
-            # Check response status
-            success = response.get("status") == "ok"
-            if not success:
-                # Log error details
-                statuses = response.get("response", {}).get("data", {}).get("statuses", [])
-                if statuses and "error" in statuses[0]:
-                    error_msg = statuses[0]["error"]
-                    print(f"   ⚠️  SL order error: {error_msg}")
+            ))
             
-            return {
+            # Check response status; the exchange also rejects single orders
+            # inside an "ok" response, as an "error" in their status
+            error_msg = _response_error(response)
+            success = response.get("status") == "ok" and error_msg is None
+            result = {
                 "success": success,
                 "response": response,
                 "sl_price": sl_price,
             }
+            if not success:
+                # Log error details
+                result["error"] = error_msg or "Unknown error"
+                log.warning("   ⚠️  SL order error: %s", result["error"])
+            
+            return result
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
             }
+    
+    def set_tp_sl(
+        self,
+        symbol: str,
+        entry_price: float,
+        position_size: float,
+        tp_percent: float,
+        sl_percent: float,
+        is_long: bool = True,
+        tp_price: Optional[float] = None,
+        sl_price: Optional[float] = None,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Set a take-profit and a stop-loss order with a single signed request.
+        
+        Args:
+            symbol: Trading symbol (e.g., "BTC")
+            entry_price: Entry price of the position
+            position_size: Position size in base units
+            tp_percent: Take profit percentage (e.g., 5.0 for 5%)
+            sl_percent: Stop loss percentage (e.g., 2.0 for 2%)
+            is_long: True for long position, False for short
+            tp_price: Precomputed TP price (from get_trigger_price), if any
+            sl_price: Precomputed SL price (from get_trigger_price), if any
+        
+        Returns:
+            Dictionary with "take_profit" and "stop_loss" response dictionaries,
+            shaped like the results of set_take_profit and set_stop_loss
+        """
+        # TP/SL prices based on position direction, unless already computed
+        if tp_price is None:
+            tp_price = self.get_trigger_price(symbol, entry_price, tp_percent, "tp", is_long)
+        if sl_price is None:
+            sl_price = self.get_trigger_price(symbol, entry_price, sl_percent, "sl", is_long)
+        
+        try:
+            # Both legs close the position, so they trade against its direction
+            orders = []
+            for price, tpsl in ((tp_price, "tp"), (sl_price, "sl")):
+                orders.append({
+                    "coin": symbol,
+                    "is_buy": not is_long,
+                    "sz": float(position_size),
+                    "limit_px": price,  # trigger price, as in set_take_profit
+                    "order_type": _trigger_order_type(price, tpsl),
+                    "reduce_only": True,
+                })
+            
+            # One action carries both orders; its statuses are in the same order
+            response = _call_with_backoff(lambda: self.exchange.bulk_orders(orders))
+        except Exception as e:
+            return {
+                "take_profit": {"success": False, "error": str(e)},
+                "stop_loss": {"success": False, "error": str(e)},
+            }
+        
+        ok = isinstance(response, dict) and response.get("status") == "ok"
+        statuses = response.get("response", {}).get("data", {}).get("statuses", []) if ok else []
+        
+        results = {}
+        for i, (key, price_key, price) in enumerate((
+            ("take_profit", "tp_price", tp_price),
+            ("stop_loss", "sl_price", sl_price),
+        )):
+            result = {"success": False, "response": response, price_key: price}
+            if i < len(statuses) and "error" not in statuses[i]:
+                result["success"] = True
+            elif i < len(statuses):
+                result["error"] = statuses[i]["error"]
+            else:
+                result["error"] = response.get("response", "No status returned") if isinstance(response, dict) else str(response)
+            results[key] = result
+        return results